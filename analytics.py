@@ -0,0 +1,147 @@
+from datetime import time, timedelta
+
+import pandas as pd
+from sqlalchemy import func, or_
+
+from models import db, DailySales, Order, OrderItem
+
+# Orders in these states never turned into sales
+EXCLUDED_STATUSES = ("cancelled",)
+
+
+def _order_filters(start=None, end=None):
+    filters = [or_(Order.status.is_(None), Order.status.notin_(EXCLUDED_STATUSES))]
+    if start:
+        filters.append(Order.order_time >= start)
+    if end:
+        filters.append(Order.order_time < end)
+    return filters
+
+
+def _frame(rows, columns):
+    return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+
+def _records(df):
+    return df.to_dict("records")
+
+
+def _rollup_filters(start=None, end=None):
+    # daily_sales is day-granular: a range covers every day it touches
+    filters = []
+    if start:
+        filters.append(DailySales.sale_date >= start.date())
+    if end:
+        last_day = end.date() if end.time() != time.min else end.date() - timedelta(days=1)
+        filters.append(DailySales.sale_date <= last_day)
+    return filters
+
+
+def revenue_by_period(start=None, end=None):
+    """Daily revenue from the rollup, resampled to Monday-based weeks with pandas."""
+    rows = db.session.execute(
+        db.select(DailySales.sale_date, func.sum(DailySales.quantity), func.sum(DailySales.revenue))
+        .where(*_rollup_filters(start, end))
+        .group_by(DailySales.sale_date)
+        .order_by(DailySales.sale_date)
+    ).all()
+    daily = _frame(rows, ["date", "quantity", "revenue"])
+    if daily.empty:
+        return [], []
+
+    daily["date"] = pd.to_datetime(daily["date"])
+    weekly = (daily.set_index("date")
+              .resample("W-MON", label="left", closed="left")
+              .sum()
+              .reset_index()
+              .rename(columns={"date": "week_start"}))
+    weekly = weekly[weekly["quantity"] > 0]
+
+    daily["date"] = daily["date"].dt.strftime("%Y-%m-%d")
+    weekly["week_start"] = weekly["week_start"].dt.strftime("%Y-%m-%d")
+    daily["revenue"] = daily["revenue"].round(2)
+    weekly["revenue"] = weekly["revenue"].round(2)
+    return _records(daily), _records(weekly)
+
+
+def top_products(start=None, end=None, limit=10):
+    """Best sellers by quantity and by revenue, from the rollup."""
+    quantity = func.sum(DailySales.quantity)
+    revenue = func.sum(DailySales.revenue)
+    base = (db.select(DailySales.product_id, func.max(DailySales.product_name), quantity, revenue)
+            .where(*_rollup_filters(start, end))
+            .group_by(DailySales.product_id))
+    columns = ["product_id", "name", "quantity", "revenue"]
+
+    by_quantity = _frame(db.session.execute(base.order_by(quantity.desc()).limit(limit)).all(), columns)
+    by_revenue = _frame(db.session.execute(base.order_by(revenue.desc()).limit(limit)).all(), columns)
+    for df in (by_quantity, by_revenue):
+        df["revenue"] = df["revenue"].round(2)
+    return _records(by_quantity), _records(by_revenue)
+
+
+def basket_stats(start=None, end=None):
+    """Order count, revenue, average order value and items per order."""
+    order_count, revenue = db.session.execute(
+        db.select(func.count(Order.id), func.sum(Order.total_price))
+        .where(*_order_filters(start, end))
+    ).one()
+    item_count = db.session.execute(
+        db.select(func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(*_order_filters(start, end))
+    ).scalar()
+    revenue = revenue or 0
+    return {
+        "orders": order_count,
+        "revenue": round(revenue, 2),
+        "average_order_value": round(revenue / order_count, 2) if order_count else 0,
+        "average_items_per_order": round((item_count or 0) / order_count, 2) if order_count else 0
+    }
+
+
+def category_breakdown(start=None, end=None):
+    """Quantity and revenue per product category, from the rollup."""
+    rows = db.session.execute(
+        db.select(DailySales.category, func.sum(DailySales.quantity), func.sum(DailySales.revenue))
+        .where(*_rollup_filters(start, end))
+        .group_by(DailySales.category)
+    ).all()
+    df = _frame(rows, ["category", "quantity", "revenue"])
+    df["revenue"] = df["revenue"].round(2)
+    df["share"] = (df["revenue"] / df["revenue"].sum()).round(4) if not df.empty else df["revenue"]
+    return _records(df.sort_values("revenue", ascending=False))
+
+
+def city_breakdown(start=None, end=None):
+    """Order count and revenue per delivery city."""
+    rows = db.session.execute(
+        db.select(Order.city, func.count(Order.id), func.sum(Order.total_price))
+        .where(*_order_filters(start, end))
+        .group_by(Order.city)
+    ).all()
+    df = _frame(rows, ["city", "orders", "revenue"])
+    df["revenue"] = df["revenue"].round(2)
+    return _records(df.sort_values("revenue", ascending=False))
+
+
+def sales_summary(start=None, end=None, top_n=10):
+    """Everything the admin analytics view needs for one date range.
+
+    Product, category and per-day figures come from the daily_sales rollup
+    (see rollup.py); order-level totals and cities come from indexed
+    order_time range scans of the order table.
+    """
+    daily, weekly = revenue_by_period(start, end)
+    by_quantity, by_revenue = top_products(start, end, top_n)
+    return {
+        "date_from": start.isoformat() if start else None,
+        "date_to": end.isoformat() if end else None,
+        "totals": basket_stats(start, end),
+        "revenue_by_day": daily,
+        "revenue_by_week": weekly,
+        "top_products_by_quantity": by_quantity,
+        "top_products_by_revenue": by_revenue,
+        "categories": category_breakdown(start, end),
+        "cities": city_breakdown(start, end)
+    }
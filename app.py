@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, redirect, request, send_file, stream_with_context, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
@@ -6,23 +6,55 @@ import os
 import json
 from datetime import datetime, timedelta
 import logging
-import pandas as pd
 import io
+import csv
+import tempfile
+import base64
+import secrets
 import jwt
+import click
 from functools import wraps
-from models import db, Product, Order
+from werkzeug.utils import safe_join
+from openpyxl import Workbook
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only, selectinload
+from models import db, Product, Order, OrderItem
+from analytics import sales_summary
+from rollup import order_deleted, order_status_changed, record_order_sales, refresh_daily_sales
+from idempotency import idempotent
+from db_pool import engine_options, pool_stats
+from sqlite_tuning import SQLITE_WRITE_QUEUE, WriteQueue, begin_immediate, configure_sqlite
+from logging_config import configure_logging
+from metrics import init_metrics, render_metrics
+from query_profiler import init_query_profiler
+from json_provider import make_json_provider
+from serializers import order_serializer, product_serializer
+from search import search_products
+from product_import import IMPORT_BATCH_SIZE, import_products
+from replenishment import reorder_suggestions
+from reservations import (InsufficientStock, availability, available_stock, cart_holds, init_reservations,
+                          publish_stock_changes, release_cart, reserve)
+from events import EVENT_TYPES, STREAM_MAX_CLIENTS, broker, init_events, publish
+import thumbnails
+from thumbnails import FORMATS as THUMBNAIL_FORMATS, THUMBNAIL_WIDTHS, thumbnail_cache
+from compression import init_compression, use_precompressed
+from catalog_cache import CatalogEntry, catalog_cache, invalidate_on_write, mark_catalog_dirty
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (levels, format and sampling come from the environment)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask App
 app = Flask(__name__)
+# orjson when installed; ISO 8601 datetimes either way (see json_provider.py)
+app.json = make_json_provider(app)
 CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "https://*", "http://*"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+        "expose_headers": ["X-Next-Cursor", "Idempotent-Replayed"]
     }
 }, supports_credentials=True)
 
@@ -34,6 +66,8 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Pool sizing, pre-ping, recycling and statement timeout (see db_pool.py)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(DATABASE_URL)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "your-secret-key")
 app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "your-jwt-secret-key")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
@@ -42,10 +76,44 @@ app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# SQLite: WAL and connection pragmas, plus the optional group-commit write queue
+write_queue = None
+if DATABASE_URL.startswith("sqlite"):
+    with app.app_context():
+        configure_sqlite(db.engine)
+    if SQLITE_WRITE_QUEUE:
+        write_queue = WriteQueue(app, db)
+
+# Drop cached catalog payloads whenever a transaction writes to the product table
+invalidate_on_write(Product)
+
+# Latency, status, response size and per-request query metrics (see metrics.py)
+init_metrics(app, db)
+# Slow-query log, plus per-request query log and N+1 warnings with QUERY_PROFILING=1
+init_query_profiler(app, db)
+# gzip/brotli for JSON and CSV responses the client will accept compressed
+init_compression(app)
+# Background expiry of abandoned cart holds (see reservations.py)
+init_reservations(app)
+# Change events for /api/stream, fanned out per worker (see events.py)
+init_events(app)
+
 # Admin credentials (in a real app, this would be stored securely in a database)
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"  # In a real app, this would be hashed
 
+def decode_token(token, scope=None):
+    """The admin username in a valid token; raises for invalid or expired ones.
+
+    Tokens issued for one purpose (e.g. scope "stream") are rejected
+    everywhere else, and full admin tokens are rejected where a scope is
+    required.
+    """
+    data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
+    if data.get("scope") != scope:
+        raise jwt.InvalidTokenError("token was issued for a different purpose")
+    return data['username']
+
 # Token required decorator
 def token_required(f):
     @wraps(f)
@@ -61,17 +129,35 @@ def token_required(f):
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            # Decode the token
-            data = jwt.decode(token, app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            current_user = data['username']
+            current_user = decode_token(token)
         except Exception as e:
-            logger.error(f"Token validation error: {str(e)}")
+            logger.error("Token validation error: %s", e)
             return jsonify({'message': 'Token is invalid'}), 401
             
         return f(current_user, *args, **kwargs)
     
     return decorated
 
+def conditional_json(body, etag=None, last_modified=None):
+    """Build a JSON response that honours If-None-Match / If-Modified-Since.
+
+    Clients get a 304 with no body when their cached copy is still current.
+    The ETag is weak and the response varies on Accept-Encoding whether or
+    not this one ends up compressed, so a 304 carries the same validator
+    and Vary as the 200 it revalidates (see compression.py).
+    """
+    response = app.response_class(body, mimetype="application/json")
+    if etag:
+        response.set_etag(etag, weak=True)
+    else:
+        response.add_etag(weak=True)
+    response.vary.add("Accept-Encoding")
+    if last_modified:
+        response.last_modified = last_modified
+    # Let kiosks keep a copy but revalidate it on every poll
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # Error Handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -86,68 +172,240 @@ def server_error(error):
 def test_route():
     return jsonify({"message": "API is working!"}), 200
 
+# Prometheus scrape endpoint, summed across gunicorn workers
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 # Routes
 @app.route("/api/products", methods=["GET"])
 def get_products():
     try:
         logger.debug("Received request for products")
         
+        category = request.args.get("category")
+        logger.debug("Category filter: %s", category)
+        cache_key = category.lower() if category else "all"
+        
+        # Serve from the in-memory catalog cache when possible
+        entry = catalog_cache.get(cache_key)
+        if entry is not None:
+            return use_precompressed(conditional_json(entry.body, entry.etag, entry.last_modified), entry)
+        version = catalog_cache.version
+        
         # Check if database exists
         db_exists = os.path.exists(os.path.join(BASE_DIR, 'database.db'))
-        logger.debug(f"Database exists: {db_exists}")
+        logger.debug("Database exists: %s", db_exists)
         
         if not db_exists:
             logger.error("Database file not found")
             return jsonify({"error": "Database not initialized"}), 500
             
         # Get products
-        category = request.args.get("category")
-        logger.debug(f"Category filter: {category}")
-        
         query = Product.query
-        if category and category.lower() != 'all':
-            query = query.filter(Product.category.ilike(category))
+        if cache_key != 'all':
+            # Matches ix_product_category_lower, unlike ilike()
+            query = query.filter(func.lower(Product.category) == cache_key)
             
         products = query.all()
-        logger.debug(f"Found {len(products)} products")
+        logger.debug("Found %d products", len(products))
     
         if not products:
             logger.warning("No products found in database")
             return jsonify({"message": "No products available"}), 404
 
-        product_list = [{
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "category": product.category.lower(),  # Convert to lowercase for consistency
-            "image": product.image,
-            "description": product.description,
-            "stock": product.stock
-        } for product in products]
+        product_list = product_serializer.many(products)
     
-        logger.debug(f"Returning {len(product_list)} products")
-        return jsonify(product_list)
+        entry = CatalogEntry(app.json.dumps(product_list))
+        entry.last_modified = catalog_cache.last_modified(cache_key, entry.etag)
+        catalog_cache.set(cache_key, entry, version)
+        logger.debug("Returning %d products", len(product_list))
+        return use_precompressed(conditional_json(entry.body, entry.etag, entry.last_modified), entry)
+    except Exception as e:
+        logger.error("Error in get_products: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+@app.route("/api/products/search", methods=["GET"])
+def search_products_route():
+    """Type-ahead product search: ?q=<terms>[&category=][&limit=]."""
+    try:
+        q = request.args.get("q", "").strip()
+        if not q:
+            return jsonify({"error": "q is required"}), 400
+        try:
+            limit = min(int(request.args.get("limit", SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        if limit < 1:
+            return jsonify({"error": "limit must be positive"}), 400
+
+        products = search_products(q, limit, request.args.get("category"))
+        return jsonify(product_serializer.many(products))
     except Exception as e:
-        logger.error(f"Error in get_products: {str(e)}")
+        logger.error("Error searching products: %s", e)
         return jsonify({"error": str(e)}), 500
 
+IMAGE_MAX_AGE = 365 * 24 * 3600
+IMAGE_REDIRECT_MAX_AGE = 300
+
+@app.route("/api/images/<name>", methods=["GET"])
+def get_image_variant(name):
+    """Resized product image: ?w=<width>, redirected to a versioned, immutable URL."""
+    if not thumbnails.available():
+        return jsonify({"error": "Image resizing is not available (Pillow is not installed)"}), 501
+    source = safe_join(thumbnails.IMAGES_DIR, name)
+    if source is None or not os.path.isfile(source):
+        return jsonify({"error": "Image not found"}), 404
+    try:
+        width = thumbnails.snap_width(int(request.args.get("w", THUMBNAIL_WIDTHS[-1])))
+    except ValueError:
+        return jsonify({"error": "w must be an integer"}), 400
+
+    version = thumbnails.source_version(source)
+    fmt = request.args.get("fmt")
+    if fmt not in THUMBNAIL_FORMATS or request.args.get("v") != version or request.args.get("w") != str(width):
+        if fmt not in THUMBNAIL_FORMATS:
+            fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
+        response = redirect(url_for("get_image_variant", name=name, w=width, fmt=fmt, v=version))
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_REDIRECT_MAX_AGE
+        response.vary.add("Accept")
+        return response
+
+    try:
+        path = thumbnail_cache.get_or_create(source, name, width, fmt, version)
+    except Exception as e:
+        logger.error("Error resizing image %s: %s", name, e)
+        return jsonify({"error": "Could not resize image"}), 500
+    # The URL changes with the source file, so the variant can be cached forever
+    response = send_file(path, mimetype=THUMBNAIL_FORMATS[fmt][1], max_age=IMAGE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route("/api/products/<int:product_id>", methods=["GET"])
 def get_product(product_id):
     try:
         product = Product.query.get_or_404(product_id)
-        return jsonify({
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "category": product.category,
-            "image": product.image,
-            "description": product.description,
-            "stock": product.stock
-        })
+        body = app.json.dumps(product_serializer(product))
+        return conditional_json(body, last_modified=product.updated_at)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def run_write(fn):
+    """Run the write function `fn` and commit, returning its result.
+
+    With the SQLite write queue enabled, `fn` is handed to the writer thread
+    and committed together with other pending writes; otherwise it runs in
+    the request's own session. Either way `fn` must return plain values.
+    """
+    if write_queue is not None:
+        return write_queue.submit(fn)
+    try:
+        begin_immediate(db.session)
+        result = fn()
+        db.session.commit()
+        return result
+    except Exception:
+        db.session.rollback()
+        raise
+
+def decrement_stock(quantities):
+    """Take `quantities` ({product_id: quantity}) out of stock in one step.
+
+    Runs inside the current transaction, so the decrement commits or rolls
+    back together with the order. Units held by carts (Product.reserved) are
+    not available. Returns None on success, or the id of the first product
+    that cannot cover its quantity, in which case no stock has been changed.
+    """
+    product_ids = sorted(quantities)
+    if not product_ids:
+        return None
+    now = datetime.utcnow()
+
+    if db.engine.dialect.name == "postgresql":
+        # Lock every row up front, in id order so concurrent checkouts
+        # sharing products queue behind each other instead of deadlocking
+        rows = db.session.execute(
+            select(Product.id, Product.stock, Product.reserved)
+            .where(Product.id.in_(product_ids))
+            .order_by(Product.id)
+            .with_for_update()
+        ).all()
+        stock = {product_id: stock for product_id, stock, _ in rows}
+        available = {product_id: available_stock(stock, reserved) for product_id, stock, reserved in rows}
+        for product_id in product_ids:
+            if available.get(product_id, 0) < quantities[product_id]:
+                return product_id
+        db.session.execute(update(Product), [
+            {"id": product_id, "stock": stock[product_id] - quantities[product_id], "updated_at": now}
+            for product_id in product_ids
+        ])
+        return None
+
+    # SQLite has no row locks: a guarded UPDATE checks and decrements each row
+    # atomically under the database write lock, sent as a single executemany
+    table = Product.__table__
+    savepoint = db.session.begin_nested()
+    result = db.session.connection().execute(
+        table.update()
+        .where(table.c.id == bindparam("product_id"), table.c.stock - table.c.reserved >= bindparam("quantity"))
+        .values(stock=table.c.stock - bindparam("quantity"), updated_at=now),
+        [{"product_id": product_id, "quantity": quantities[product_id]} for product_id in product_ids]
+    )
+    if result.rowcount == len(product_ids):
+        savepoint.commit()
+        mark_catalog_dirty(db.session)
+        return None
+
+    # Some line was short; undo the partial decrement and find out which
+    savepoint.rollback()
+    available = {
+        product_id: available_stock(stock, reserved)
+        for product_id, stock, reserved in db.session.execute(
+            select(Product.id, Product.stock, Product.reserved).where(Product.id.in_(product_ids))
+        )
+    }
+    for product_id in product_ids:
+        if available.get(product_id, 0) < quantities[product_id]:
+            return product_id
+    return product_ids[0]
+
+def order_items_from_cart(cart):
+    """Build OrderItem rows from the cart items posted by the kiosk."""
+    return [
+        OrderItem(
+            product_id=item.get("id"),
+            name=str(item.get("name", ""))[:100],
+            unit_price=item.get("price", 0),
+            quantity=item.get("quantity", 1)
+        )
+        for item in cart
+    ]
+
+def order_details(data):
+    """Payment, delivery and customer columns of an Order, from a kiosk request body."""
+    address = data.get("address") or {}
+    return {
+        "payment_method": data.get("paymentMethod", "Unknown"),
+        "street": address.get("street", ""),
+        "city": address.get("city", ""),
+        "state": address.get("state", ""),
+        "zip_code": address.get("zipCode", ""),
+        "customer_name": data.get("customerName", ""),
+        "customer_email": data.get("customerEmail", ""),
+        "customer_phone": data.get("customerPhone", ""),
+        "notes": data.get("notes", ""),
+    }
+
+def new_transaction_id():
+    return f"TXN-{secrets.token_hex(8).upper()}"
+
 @app.route("/api/checkout", methods=["POST"])
+@idempotent
 def checkout():
     try:
         data = request.json
@@ -155,204 +413,367 @@ def checkout():
         if not data or "cart" not in data or "total_price" not in data:
             return jsonify({"error": "Invalid request"}), 400
 
-        # Validate cart items
         cart = data["cart"]
-        for item in cart:
-            product = Product.query.get(item["id"])
-            if not product or product.stock < item["quantity"]:
-                return jsonify({"error": f"Insufficient stock for {item['name']}"}), 400
+        if not isinstance(cart, list) or not cart:
+            return jsonify({"error": "cart must be a non-empty list"}), 400
+        for line, item in enumerate(cart, start=1):
+            # A negative quantity would pass the stock check and add stock
+            if not isinstance(item, dict) or not valid_quantity(item.get("id")) \
+                    or not valid_quantity(item.get("quantity")):
+                return jsonify({"error": f"cart line {line} needs an id and a positive integer quantity"}), 400
 
-        # Create order
-        new_order = Order(
-            items=json.dumps(cart),
-            total_price=data["total_price"]
-        )
-        
-        # Update stock
+        # Collapse the cart into one quantity per product
+        quantities = {}
+        names = {}
         for item in cart:
-            product = Product.query.get(item["id"])
-            product.stock -= item["quantity"]
-        
-        db.session.add(new_order)
-        db.session.commit()
+            quantities[item["id"]] = quantities.get(item["id"], 0) + item["quantity"]
+            names.setdefault(item["id"], item.get("name", item["id"]))
+
+        cart_id = data.get("cart_id")
+        transaction_id = data.get("transactionId") or new_transaction_id()
+
+        def place_order():
+            # The cart's own holds become the stock decrement; if any line is
+            # short they are restored along with everything else
+            savepoint = db.session.begin_nested()
+            released = release_cart(cart_id, publish_changes=False) if cart_id else {}
+            # Validate and update stock
+            short_product_id = decrement_stock(quantities)
+            if short_product_id is not None:
+                savepoint.rollback()
+                return None, short_product_id
+            savepoint.commit()
+
+            # Create order
+            new_order = Order(
+                transaction_id=transaction_id,
+                items=json.dumps(cart),
+                order_items=order_items_from_cart(cart),
+                total_price=data["total_price"],
+                **order_details(data)
+            )
+
+            db.session.add(new_order)
+            db.session.flush()
+            record_order_sales(new_order)
+            publish("order-created", order_serializer(new_order))
+            publish_stock_changes(set(quantities) | set(released))
+            return new_order.id, None
+
+        try:
+            order_id, short_product_id = run_write(place_order)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": f"Transaction {transaction_id} has already been placed"}), 409
+        if short_product_id is not None:
+            return jsonify({"error": f"Insufficient stock for {names[short_product_id]}"}), 400
         
         return jsonify({
             "message": "Order placed successfully!",
-            "order_id": new_order.id
+            "order_id": order_id,
+            "transaction_id": transaction_id
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# Stock reservations (see reservations.py)
+def valid_cart_id(cart_id):
+    return 0 < len(cart_id) <= 64
+
+def valid_quantity(value, minimum=1):
+    """True for an int (not a bool) of at least `minimum`."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+@app.route("/api/carts/<cart_id>/items/<int:product_id>", methods=["PUT"])
+def reserve_cart_item(cart_id, product_id):
+    """Hold {"quantity": n} units of a product for the cart (0 releases the hold)."""
+    try:
+        data = request.get_json(silent=True) or {}
+        quantity = data.get("quantity")
+        if not valid_cart_id(cart_id):
+            return jsonify({"error": "cart_id must be 1-64 characters"}), 400
+        if not valid_quantity(quantity, minimum=0):
+            return jsonify({"error": "quantity must be a non-negative integer"}), 400
+
+        try:
+            hold = run_write(lambda: reserve(cart_id, product_id, quantity))
+        except InsufficientStock as e:
+            return jsonify({"error": "Insufficient stock", "product_id": product_id,
+                            "available": e.available}), 409
+        except LookupError:
+            return jsonify({"error": "Product not found"}), 404
+        except IntegrityError:
+            return jsonify({"error": "The cart was changed concurrently, please retry"}), 409
+        return jsonify(hold)
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error reserving stock for cart %s: %s", cart_id, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/carts/<cart_id>", methods=["GET"])
+def get_cart_holds(cart_id):
+    try:
+        return jsonify({"cart_id": cart_id, "holds": cart_holds(cart_id)})
+    except Exception as e:
+        logger.error("Error reading holds for cart %s: %s", cart_id, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/carts/<cart_id>", methods=["DELETE"])
+def release_cart_holds(cart_id):
+    """Release every hold of an abandoned or emptied cart."""
+    try:
+        released = run_write(lambda: release_cart(cart_id))
+        return jsonify({"cart_id": cart_id, "released": sum(released.values())})
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error releasing cart %s: %s", cart_id, e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/products/availability", methods=["GET"])
+def get_availability():
+    """Stock minus cart holds: ?ids=1,2,3 (default: every product)."""
+    try:
+        ids = request.args.get("ids")
+        try:
+            product_ids = [int(i) for i in ids.split(",") if i.strip()] if ids else None
+        except ValueError:
+            return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+        return jsonify(availability(product_ids))
+    except Exception as e:
+        logger.error("Error reading availability: %s", e)
+        return jsonify({"error": str(e)}), 500
+
 # New endpoint to save order details
 @app.route("/api/order-details", methods=["POST"])
+@idempotent
 def save_order_details():
     try:
         data = request.json
-        logger.debug(f"Received order details: {data}")
+        logger.debug("Received order details for transaction %s", data.get("transactionId") if data else None)
         
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
         transaction_id = data.get("transactionId", "UNKNOWN")
         
-        # Check if order with this transaction ID already exists
-        existing_order = Order.query.filter_by(transaction_id=transaction_id).first()
-        
-        if existing_order:
-            logger.debug(f"Order with transaction ID {transaction_id} already exists, returning success")
-            return jsonify({
-                "message": "Order already exists",
-                "order_id": existing_order.id
-            }), 200
-        
         # Create a new order with the provided details
         new_order = Order(
             transaction_id=transaction_id,
             items=json.dumps(data.get("items", [])),
+            order_items=order_items_from_cart(data.get("items", [])),
             total_price=data.get("totalPrice", 0),
-            payment_method=data.get("paymentMethod", "Unknown"),
-            street=data.get("address", {}).get("street", ""),
-            city=data.get("address", {}).get("city", ""),
-            state=data.get("address", {}).get("state", ""),
-            zip_code=data.get("address", {}).get("zipCode", ""),
             expected_delivery=datetime.fromisoformat(data.get("expectedDelivery", datetime.now().isoformat())),
-            customer_name=data.get("customerName", ""),
-            customer_email=data.get("customerEmail", ""),
-            customer_phone=data.get("customerPhone", ""),
-            notes=data.get("notes", "")
+            **order_details(data)
         )
         
-        db.session.add(new_order)
-        db.session.commit()
+        def insert_order():
+            # The unique transaction_id decides between duplicate submissions,
+            # so no lookup is needed up front
+            try:
+                with db.session.begin_nested():
+                    db.session.add(new_order)
+                    db.session.flush()
+            except IntegrityError:
+                existing_order = Order.query.filter_by(transaction_id=transaction_id).first()
+                if existing_order is None:
+                    raise
+                return existing_order.id, False
+            record_order_sales(new_order)
+            publish("order-created", order_serializer(new_order))
+            return new_order.id, True
+
+        order_id, created = run_write(insert_order)
+        if not created:
+            logger.debug("Order with transaction ID %s already exists, returning success", transaction_id)
+            return jsonify({
+                "message": "Order already exists",
+                "order_id": order_id
+            }), 200
     
-        logger.debug(f"Order saved successfully with ID: {new_order.id}")
+        logger.debug("Order saved successfully with ID: %s", order_id)
         return jsonify({
             "message": "Order details saved successfully",
-            "order_id": new_order.id
+            "order_id": order_id
         }), 201
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error saving order details: {str(e)}")
+        logger.error("Error saving order details: %s", e)
         return jsonify({"error": str(e)}), 500
 
-# Endpoint to export orders to Excel
+# Order export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = [
+    "Order ID", "Transaction ID", "Order Time", "Expected Delivery", "Items",
+    "Total Price", "Payment Method", "Street", "City", "State", "Zip Code",
+    "Customer Name", "Customer Email", "Customer Phone", "Status", "Notes"
+]
+
+def export_row(order):
+    """Flatten an Order into a row matching EXPORT_COLUMNS."""
+    items_str = ", ".join([f"{item.name} (x{item.quantity})" for item in order.order_items])
+
+    return [
+        order.id,
+        order.transaction_id,
+        order.order_time.strftime("%Y-%m-%d %H:%M:%S") if order.order_time else "N/A",
+        order.expected_delivery.strftime("%Y-%m-%d %H:%M:%S") if order.expected_delivery else "N/A",
+        items_str,
+        order.total_price,
+        order.payment_method,
+        order.street,
+        order.city,
+        order.state,
+        order.zip_code,
+        order.customer_name,
+        order.customer_email,
+        order.customer_phone,
+        order.status,
+        order.notes
+    ]
+
+def sample_export_rows():
+    """Sample rows exported when the database has no orders at all."""
+    test_orders = [
+        {
+            "id": 1,
+            "transaction_id": "TEST-1234",
+            "items": [
+                {"name": "Apple", "quantity": 2, "price": 2.99},
+                {"name": "Banana", "quantity": 3, "price": 1.99}
+            ],
+            "total_price": 11.95,
+            "payment_method": "Cash on Delivery",
+            "street": "123 Test St",
+            "city": "Test City",
+            "state": "Test State",
+            "zip_code": "12345",
+            "order_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "expected_delivery": (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+            "customer_name": "Test Customer",
+            "customer_phone": "555-1234",
+            "customer_email": "test@example.com",
+            "status": "pending",
+            "notes": "Test order for debugging"
+        },
+        {
+            "id": 2,
+            "transaction_id": "TEST-5678",
+            "items": [
+                {"name": "Carrot", "quantity": 1, "price": 1.49},
+                {"name": "Water", "quantity": 2, "price": 0.99}
+            ],
+            "total_price": 3.47,
+            "payment_method": "Credit Card",
+            "street": "456 Test Ave",
+            "city": "Test City",
+            "state": "Test State",
+            "zip_code": "12345",
+            "order_time": (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+            "expected_delivery": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "customer_name": "Another Customer",
+            "customer_phone": "555-5678",
+            "customer_email": "another@example.com",
+            "status": "delivered",
+            "notes": "Another test order"
+        }
+    ]
+    for order in test_orders:
+        items_str = ", ".join([f"{item['name']} (x{item['quantity']})" for item in order["items"]])
+        yield [
+            order["id"], order["transaction_id"], order["order_time"], order["expected_delivery"],
+            items_str, order["total_price"], order["payment_method"], order["street"],
+            order["city"], order["state"], order["zip_code"], order["customer_name"],
+            order["customer_email"], order["customer_phone"], order["status"], order["notes"]
+        ]
+
+def iter_orders(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the orders matched by `query` in (order_time, id) keyset batches.
+
+    Each batch loads its order items in one extra query and is dropped from
+    the session once consumed, so memory stays flat however many rows match.
+    """
+    last_key = None
+    while True:
+        batch_query = query
+        if last_key:
+            batch_query = batch_query.filter(tuple_(Order.order_time, Order.id) > last_key)
+        batch = (batch_query.options(selectinload(Order.order_items))
+                 .order_by(Order.order_time, Order.id)
+                 .limit(batch_size)
+                 .all())
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last_key = (batch[-1].order_time, batch[-1].id)
+        for order in batch:
+            db.session.expunge(order)
+
+def stream_csv(rows):
+    """Encode rows as CSV a batch at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Endpoint to export orders to Excel or CSV
 @app.route("/api/export-orders", methods=["GET"])
 def export_orders():
+    """Export orders as XLSX (default) or CSV (?format=csv).
+
+    Optional filters: status, date_from, date_to. Orders are read from the
+    database in batches of EXPORT_BATCH_SIZE (see iter_orders), so memory use
+    does not grow with the number of orders exported.
+    """
     try:
-        # Get all orders
-        orders = Order.query.all()
-        
-        if not orders:
+        export_format = request.args.get("format", "xlsx").lower()
+        if export_format not in ("xlsx", "csv"):
+            return jsonify({"error": "format must be 'xlsx' or 'csv'"}), 400
+        try:
+            date_from, date_to = parse_date_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid date: {str(e)}"}), 400
+
+        query = Order.query
+        if request.args.get("status"):
+            query = query.filter(Order.status == request.args["status"])
+        if date_from:
+            query = query.filter(Order.order_time >= date_from)
+        if date_to:
+            query = query.filter(Order.order_time < date_to)
+
+        filtered = bool(request.args.get("status") or date_from or date_to)
+        if not filtered and Order.query.first() is None:
             # If no orders in database, return test orders
             logger.debug("No orders found, returning test orders for export")
-            test_orders = [
-                {
-                    "id": 1,
-                    "transaction_id": "TEST-1234",
-                    "items": [
-                        {"name": "Apple", "quantity": 2, "price": 2.99},
-                        {"name": "Banana", "quantity": 3, "price": 1.99}
-                    ],
-                    "total_price": 11.95,
-                    "payment_method": "Cash on Delivery",
-                    "street": "123 Test St",
-                    "city": "Test City",
-                    "state": "Test State",
-                    "zip_code": "12345",
-                    "order_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "expected_delivery": (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
-                    "customer_name": "Test Customer",
-                    "customer_phone": "555-1234",
-                    "customer_email": "test@example.com",
-                    "status": "pending",
-                    "notes": "Test order for debugging"
-                },
-                {
-                    "id": 2,
-                    "transaction_id": "TEST-5678",
-                    "items": [
-                        {"name": "Carrot", "quantity": 1, "price": 1.49},
-                        {"name": "Water", "quantity": 2, "price": 0.99}
-                    ],
-                    "total_price": 3.47,
-                    "payment_method": "Credit Card",
-                    "street": "456 Test Ave",
-                    "city": "Test City",
-                    "state": "Test State",
-                    "zip_code": "12345",
-                    "order_time": (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
-                    "expected_delivery": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "customer_name": "Another Customer",
-                    "customer_phone": "555-5678",
-                    "customer_email": "another@example.com",
-                    "status": "delivered",
-                    "notes": "Another test order"
-                }
-            ]
-            
-            # Prepare data for Excel from test orders
-            data = []
-            for order in test_orders:
-                items_str = ", ".join([f"{item['name']} (x{item['quantity']})" for item in order["items"]])
-                
-                data.append({
-                    "Order ID": order["id"],
-                    "Transaction ID": order["transaction_id"],
-                    "Order Time": order["order_time"],
-                    "Expected Delivery": order["expected_delivery"],
-                    "Items": items_str,
-                    "Total Price": order["total_price"],
-                    "Payment Method": order["payment_method"],
-                    "Street": order["street"],
-                    "City": order["city"],
-                    "State": order["state"],
-                    "Zip Code": order["zip_code"],
-                    "Customer Name": order["customer_name"],
-                    "Customer Email": order["customer_email"],
-                    "Customer Phone": order["customer_phone"],
-                    "Status": order["status"],
-                    "Notes": order["notes"]
-                })
+            rows = sample_export_rows()
         else:
-            # Prepare data for Excel from real orders
-            data = []
-            for order in orders:
-                try:
-                    items = json.loads(order.items) if isinstance(order.items, str) else order.items
-                    items_str = ", ".join([f"{item['name']} (x{item['quantity']})" for item in items])
-                except (json.JSONDecodeError, KeyError) as e:
-                    logger.error(f"Error processing items for order {order.id}: {str(e)}")
-                    items_str = "Error parsing items"
-                
-                data.append({
-                    "Order ID": order.id,
-                    "Transaction ID": order.transaction_id,
-                    "Order Time": order.order_time.strftime("%Y-%m-%d %H:%M:%S") if order.order_time else "N/A",
-                    "Expected Delivery": order.expected_delivery.strftime("%Y-%m-%d %H:%M:%S") if order.expected_delivery else "N/A",
-                    "Items": items_str,
-                    "Total Price": order.total_price,
-                    "Payment Method": order.payment_method,
-                    "Street": order.street,
-                    "City": order.city,
-                    "State": order.state,
-                    "Zip Code": order.zip_code,
-                    "Customer Name": order.customer_name,
-                    "Customer Email": order.customer_email,
-                    "Customer Phone": order.customer_phone,
-                    "Status": order.status,
-                    "Notes": order.notes
-                })
-        
-        # Create DataFrame and export to Excel
-        df = pd.DataFrame(data)
-        
-        # Create an in-memory Excel file
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Orders', index=False)
-            
-        # Seek to the beginning of the stream
+            rows = (export_row(order) for order in iter_orders(query))
+
+        filename = f'grocer_go_orders_{datetime.now().strftime("%Y%m%d")}.{export_format}'
+
+        if export_format == "csv":
+            return app.response_class(
+                stream_with_context(stream_csv(rows)),
+                mimetype="text/csv",
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+
+        # Write-only workbooks spill rows to disk as they are appended instead
+        # of keeping every cell in memory
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Orders")
+        sheet.append(EXPORT_COLUMNS)
+        for row in rows:
+            sheet.append(row)
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
         output.seek(0)
         
         # Return the Excel file
@@ -360,10 +781,10 @@ def export_orders():
             output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=f'grocer_go_orders_{datetime.now().strftime("%Y%m%d")}.xlsx'
+            download_name=filename
         )
     except Exception as e:
-        logger.error(f"Error exporting orders: {str(e)}")
+        logger.error("Error exporting orders: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/products", methods=["GET"])
@@ -377,52 +798,110 @@ def checkout_old():
     """Legacy endpoint for compatibility"""
     return checkout()
 
+# Order list pagination
+ORDERS_PAGE_SIZE = 100
+ORDERS_MAX_PAGE_SIZE = 500
+ORDER_FIELDS = list(order_serializer.fields)
+
+def parse_date_range(args):
+    """Read `date_from` / `date_to` (ISO dates or datetimes) from query args.
+
+    A bare `date_to` date covers that whole day. Raises ValueError on bad input.
+    """
+    start = end = None
+    if args.get("date_from"):
+        start = datetime.fromisoformat(args["date_from"])
+    if args.get("date_to"):
+        end = datetime.fromisoformat(args["date_to"])
+        if len(args["date_to"]) == 10:
+            end += timedelta(days=1)
+    return start, end
+
+def encode_cursor(order):
+    raw = json.dumps([order.order_time.isoformat(), order.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    order_time, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return datetime.fromisoformat(order_time), int(order_id)
+
 @app.route("/api/orders", methods=["GET"])
 @token_required
 def get_orders(current_user):
+    """List orders newest first, one keyset page at a time.
+
+    Query args: limit, cursor (from the X-Next-Cursor header of the previous
+    page), sort (desc|asc), status, city, payment_method, date_from, date_to
+    and fields (comma-separated projection, e.g. fields=id,status,total_price).
+    """
     try:
         logger.debug("Fetching orders...")
-        orders = Order.query.order_by(Order.order_time.desc()).all()
-        logger.debug(f"Found {len(orders)} orders")
+        try:
+            limit = min(int(request.args.get("limit", ORDERS_PAGE_SIZE)), ORDERS_MAX_PAGE_SIZE)
+            cursor = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+            date_from, date_to = parse_date_range(request.args)
+        except (ValueError, TypeError) as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+        if limit < 1:
+            return jsonify({"error": "limit must be positive"}), 400
+
+        sort = request.args.get("sort", "desc").lower()
+        if sort not in ("asc", "desc"):
+            return jsonify({"error": "sort must be 'asc' or 'desc'"}), 400
+
+        fields = ORDER_FIELDS
+        if request.args.get("fields"):
+            fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+            unknown = set(fields) - set(ORDER_FIELDS)
+            if unknown:
+                return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
+        query = Order.query
+        for arg in ("status", "city", "payment_method"):
+            if request.args.get(arg):
+                query = query.filter(getattr(Order, arg) == request.args[arg])
+        if date_from:
+            query = query.filter(Order.order_time >= date_from)
+        if date_to:
+            query = query.filter(Order.order_time < date_to)
+
+        # Keyset pagination on (order_time, id): each page is an index range
+        # scan no matter how deep into history it is
+        key = tuple_(Order.order_time, Order.id)
+        if sort == "desc":
+            if cursor:
+                query = query.filter(key < cursor)
+            query = query.order_by(Order.order_time.desc(), Order.id.desc())
+        else:
+            if cursor:
+                query = query.filter(key > cursor)
+            query = query.order_by(Order.order_time.asc(), Order.id.asc())
+
+        # Only load the requested columns (plus the cursor key); items come
+        # from order_items in one extra query for the whole page
+        columns = {"id", "order_time"} | (set(fields) - {"items"})
+        query = query.options(load_only(*[getattr(Order, c) for c in columns]))
+        if "items" in fields:
+            query = query.options(selectinload(Order.order_items))
+
+        orders = query.limit(limit + 1).all()
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        logger.debug("Found %d orders", len(orders))
         
         if not orders:
             logger.info("No orders found in database")
             return jsonify([])  # Return empty array instead of 404
             
-        order_list = []
-        for order in orders:
-            try:
-                items = json.loads(order.items) if isinstance(order.items, str) else order.items
-                logger.debug(f"Order {order.id} items: {items}")
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding items for order {order.id}: {str(e)}")
-                items = []
-            
-            order_data = {
-                "id": order.id,
-                "transaction_id": order.transaction_id,
-                "items": items,
-                "total_price": order.total_price,
-                "payment_method": order.payment_method,
-                "street": order.street,
-                "city": order.city,
-                "state": order.state,
-                "zip_code": order.zip_code,
-                "order_time": order.order_time.isoformat() if order.order_time else None,
-                "expected_delivery": order.expected_delivery.isoformat() if order.expected_delivery else None,
-                "customer_name": order.customer_name,
-                "customer_email": order.customer_email,
-                "customer_phone": order.customer_phone,
-                "status": order.status,
-                "notes": order.notes
-            }
-            order_list.append(order_data)
-            logger.debug(f"Processed order {order.id}")
+        order_list = order_serializer.only(fields).many(orders)
             
-        logger.debug(f"Returning {len(order_list)} orders")
-        return jsonify(order_list)
+        logger.debug("Returning %d orders", len(order_list))
+        response = jsonify(order_list)
+        if has_more:
+            response.headers["X-Next-Cursor"] = encode_cursor(orders[-1])
+        return response
     except Exception as e:
-        logger.error(f"Error fetching orders: {str(e)}")
+        logger.error("Error fetching orders: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/orders/<int:order_id>/status", methods=["PUT"])
@@ -441,15 +920,128 @@ def update_order_status(current_user, order_id):
         if not order:
             return jsonify({"error": "Order not found"}), 404
             
+        old_status = order.status
         order.status = status
+        order_status_changed(order, old_status)
+        if status != old_status:
+            publish("order-status-changed", {"id": order.id, "status": status, "previous_status": old_status})
         db.session.commit()
         
         return jsonify({"message": "Order status updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error updating order status: {str(e)}")
+        logger.error("Error updating order status: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/admin/analytics", methods=["GET"])
+@token_required
+def get_analytics(current_user):
+    """Sales analytics over an optional date_from/date_to range.
+
+    Aggregation happens in SQL (see analytics.py); `top` sets how many best
+    sellers to return.
+    """
+    try:
+        try:
+            date_from, date_to = parse_date_range(request.args)
+            top_n = int(request.args.get("top", 10))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+
+        return jsonify(sales_summary(date_from, date_to, top_n))
+    except Exception as e:
+        logger.error("Error computing analytics: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+PUBLIC_EVENT_TYPES = ("stock-changed",)
+# Stream tokens travel in the URL and so end up in access logs; keep them short-lived
+STREAM_TOKEN_TTL = int(os.environ.get("STREAM_TOKEN_TTL", 60))
+
+@app.route("/api/admin/stream-token", methods=["POST"])
+@token_required
+def create_stream_token(current_user):
+    """A short-lived token that only opens /api/stream (as ?token=)."""
+    token = jwt.encode({
+        "username": current_user,
+        "scope": "stream",
+        "exp": datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_TTL)
+    }, app.config["JWT_SECRET_KEY"], algorithm="HS256")
+    return jsonify({"token": token, "expires_in": STREAM_TOKEN_TTL})
+
+@app.route("/api/stream", methods=["GET"])
+def stream_events():
+    """Server-Sent Events feed of order and stock changes.
+
+    stock-changed is public; order events carry customer details and need an
+    admin token in the Authorization header. EventSource can't set headers,
+    so browsers pass ?token= from POST /api/admin/stream-token instead: it
+    expires after STREAM_TOKEN_TTL seconds and opens nothing but this
+    stream. Fetch a new one before reconnecting once it has expired.
+    ?events=a,b narrows the feed. A reconnecting client's Last-Event-ID
+    header (or ?last_event_id=) replays what it missed.
+    """
+    try:
+        token, scope = request.args.get("token"), "stream"
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            token, scope = auth_header.split(" ")[1], None
+        allowed = PUBLIC_EVENT_TYPES
+        if token:
+            try:
+                decode_token(token, scope)
+            except Exception as e:
+                logger.error("Token validation error: %s", e)
+                return jsonify({"message": "Token is invalid"}), 401
+            allowed = EVENT_TYPES
+
+        event_types = allowed
+        if request.args.get("events"):
+            event_types = [name.strip() for name in request.args["events"].split(",") if name.strip()]
+            unknown = set(event_types) - set(EVENT_TYPES)
+            if unknown:
+                return jsonify({"error": f"Unknown events: {', '.join(sorted(unknown))}"}), 400
+            if set(event_types) - set(allowed):
+                return jsonify({"message": "Order events require an admin token"}), 401
+
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+
+        if broker.subscriber_count >= STREAM_MAX_CLIENTS:
+            return jsonify({"error": "Too many open streams, retry shortly"}), 503, {"Retry-After": "5"}
+        subscriber, replay = broker.subscribe(event_types, last_event_id)
+        response = app.response_class(broker.stream(subscriber, replay), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        # Keep proxies (nginx, Render's edge) from buffering the stream
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+    except Exception as e:
+        logger.error("Error opening event stream: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/admin/reorder-suggestions", methods=["GET"])
+@token_required
+def get_reorder_suggestions(current_user):
+    """Products running low, with sales velocity and days of cover (?all=1 lists every product).
+
+    Computed by replenishment.py, which folds new orders into its sales
+    window rather than rescanning order history on each request.
+    """
+    try:
+        include_all = request.args.get("all", "").lower() in ("1", "true", "yes")
+        return jsonify(reorder_suggestions(include_all))
+    except Exception as e:
+        logger.error("Error computing reorder suggestions: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/admin/db-pool", methods=["GET"])
+@token_required
+def get_db_pool_stats(current_user):
+    """Connection pool usage for the worker that serves this request."""
+    return jsonify(pool_stats(db.engine))
+
 @app.route("/api/admin/login", methods=["POST"])
 def admin_login():
     try:
@@ -471,10 +1063,10 @@ def admin_login():
         if isinstance(token, bytes):
             token = token.decode('utf-8')
             
-        logger.debug(f"Admin login successful, token: {token[:10]}...")
+        logger.debug("Admin login successful for %s", data["username"])
         return jsonify({"token": token}), 200
     except Exception as e:
-        logger.error(f"Error during admin login: {str(e)}")
+        logger.error("Error during admin login: %s", e)
         return jsonify({"message": "Login failed"}), 500
 
 @app.route("/api/test-products", methods=["GET"])
@@ -518,7 +1110,7 @@ def get_test_products():
             "stock": 200
         }
     ]
-    logger.debug(f"Returning {len(test_products)} test products")
+    logger.debug("Returning %d test products", len(test_products))
     return jsonify(test_products)
 
 @app.route("/api/admin/test-token", methods=["GET"])
@@ -587,7 +1179,7 @@ def get_test_orders():
         }
     ]
     
-    logger.debug(f"Returning {len(test_orders)} test orders")
+    logger.debug("Returning %d test orders", len(test_orders))
     return jsonify(test_orders)
 
 @app.route("/api/orders/<int:order_id>", methods=["DELETE"])
@@ -598,14 +1190,56 @@ def delete_order(order_id):
             return jsonify({'error': 'Order not found'}), 404
         
         db.session.delete(order)
+        # Flushed first so the rebuild no longer counts the order's items
+        db.session.flush()
+        order_deleted(order)
         db.session.commit()
         
         return jsonify({'message': 'Order deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error deleting order: {str(e)}")
+        logger.error("Error deleting order: %s", e)
         return jsonify({'error': 'Failed to delete order'}), 500
 
+@app.cli.command("refresh-sales-rollup")
+@click.option("--full", is_flag=True, help="Rebuild every day instead of resuming from the watermark.")
+def refresh_sales_rollup(full):
+    """Recompute the daily_sales rollup from orders placed since the last run."""
+    watermark = refresh_daily_sales(full=full)
+    print(f"daily_sales refreshed up to {watermark.isoformat() if watermark else 'the beginning'}")
+
+@app.cli.command("import-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True, help="Rows per upsert/commit.")
+@click.option("--dry-run", is_flag=True, help="Report what would change without writing.")
+@click.option("--show", default=50, show_default=True, help="Diff lines to print per section.")
+def import_products_command(path, batch_size, dry_run, show):
+    """Upsert products from a CSV, JSON or XLSX file, matching on sku."""
+    report = import_products(path, batch_size=batch_size, dry_run=dry_run)
+    for line in report.lines(show):
+        print(line)
+    if dry_run:
+        print("Dry run: nothing was written")
+    if report.errors or report.failed:
+        raise SystemExit(1)
+
+@app.cli.command("generate-thumbnails")
+@click.option("--width", "widths", type=int, multiple=True, help="Width to generate (repeatable); default: all allowed widths.")
+@click.option("--format", "formats", type=click.Choice(sorted(THUMBNAIL_FORMATS)), multiple=True,
+              help="Format to generate (repeatable); default: all.")
+def generate_thumbnails(widths, formats):
+    """Pre-generate resized variants of every product image."""
+    if not thumbnails.available():
+        raise click.ClickException("Pillow is not installed (pip install Pillow)")
+    images = sorted({os.path.basename(image) for (image,) in
+                     db.session.query(Product.image).filter(Product.image.isnot(None)) if image})
+    count, missing = thumbnails.generate_all(
+        images, widths=widths or THUMBNAIL_WIDTHS, formats=formats or tuple(THUMBNAIL_FORMATS)
+    )
+    print(f"{count} variants of {len(images) - len(missing)} images cached in {thumbnail_cache.directory}")
+    if missing:
+        print(f"Missing source files: {', '.join(missing)}")
+
 # Run App
 if __name__ == "__main__":
     with app.app_context():
@@ -613,8 +1247,8 @@ if __name__ == "__main__":
         db.create_all()
         # Check if products exist
         product_count = Product.query.count()
-        logger.debug(f"Current product count: {product_count}")
+        logger.debug("Current product count: %d", product_count)
         if product_count == 0:
-            logger.warning("No products found in database. Please run add_products.py")
+            logger.warning("No products found in database. Please run: flask import-products sample_products.json")
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,223 @@
+"""Compare gunicorn serving modes on /api/products and /api/checkout.
+
+Starts the app under each worker configuration against a throwaway copy of
+database.db (migrated to the current schema, with stock topped up so
+checkouts never run out), drives it with concurrent clients and prints
+requests/second and latency percentiles. Any non-2xx response aborts the
+run, since error throughput says nothing about the serving mode:
+
+    python benchmark.py
+    python benchmark.py --modes sync gthread --clients 32 --duration 15
+
+Each mode is given the same number of worker processes so the comparison
+isolates the worker class. Against a local SQLite file every query returns
+in microseconds, which hides what threaded workers buy; --db-latency adds a
+fixed delay to each SQL statement to model a networked Postgres round trip:
+
+    python benchmark.py --db-latency 5
+
+/api/products is normally answered from the in-memory catalog cache; pass
+--no-catalog-cache to make every request query the database.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# database.db predates the migrations; it matches the initial revision
+BASE_REVISION = "15839c3dde7f"
+
+MODES = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"},
+    "gevent": {"GUNICORN_WORKER_CLASS": "gevent"},
+}
+
+
+def create_app():
+    """App factory used by the benchmark servers (gunicorn "benchmark:create_app()")."""
+    from sqlalchemy import event
+    from app import app, db
+
+    latency = float(os.environ.get("BENCH_DB_LATENCY_MS", 0)) / 1000
+    if latency:
+        with app.app_context():
+            @event.listens_for(db.engine, "before_cursor_execute")
+            def _simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+                time.sleep(latency)
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def prepare_database(db_path):
+    """Copy database.db to `db_path`, migrate it and give every product ample stock."""
+    shutil.copy(os.path.join(BASE_DIR, "database.db"), db_path)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", FLASK_APP="app.py", LOG_LEVEL="WARNING")
+    for command in (["stamp", BASE_REVISION], ["upgrade"]):
+        subprocess.run([sys.executable, "-m", "flask", "db", *command], cwd=BASE_DIR, env=env,
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE product SET stock = 1000000000, reserved = 0")
+
+
+def failures(statuses):
+    return {status: count for status, count in statuses.items()
+            if not (isinstance(status, int) and 200 <= status < 300)}
+
+
+def start_server(mode, port, workers, threads, database_url, db_latency, catalog_cache):
+    env = dict(os.environ, **MODES[mode])
+    env.update({
+        "PORT": str(port),
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_THREADS": str(threads),
+        # No /api/stream clients here; otherwise gunicorn.conf.py adds a
+        # thread per stream slot and the pool isn't the one being reported
+        "STREAM_MAX_CLIENTS": "0",
+        "DATABASE_URL": database_url,
+        "BENCH_DB_LATENCY_MS": str(db_latency),
+    })
+    if not catalog_cache:
+        env["CATALOG_CACHE_TTL"] = "0"
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(BASE_DIR, "gunicorn.conf.py"),
+         "--access-logfile", "/dev/null", "--log-level", "warning", "benchmark:create_app()"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def products_request(base_url):
+    return urllib.request.Request(f"{base_url}/api/products")
+
+
+def checkout_request(base_url):
+    body = json.dumps({"cart": [{"id": 1, "name": "Rice", "quantity": 1}], "total_price": 50})
+    return urllib.request.Request(
+        f"{base_url}/api/checkout", data=body.encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+
+
+def run_load(make_request, base_url, clients, duration):
+    """Keep `clients` requests in flight for `duration` seconds."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(make_request(base_url), timeout=30) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                status = e.code
+            except (urllib.error.URLError, OSError):
+                status = "error"
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    with ThreadPoolExecutor(clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread"], choices=sorted(MODES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--db-latency", type=float, default=0, help="milliseconds added to every SQL statement")
+    parser.add_argument("--no-catalog-cache", action="store_true", help="serve /api/products from the database")
+    args = parser.parse_args()
+
+    scenarios = [("/api/products", products_request), ("/api/checkout", checkout_request)]
+    results = []
+    workdir = tempfile.mkdtemp(prefix="grocer-go-bench-")
+    try:
+        for mode in args.modes:
+            # Fresh database per mode so checkout stock levels start equal
+            db_path = os.path.join(workdir, f"{mode}.db")
+            prepare_database(db_path)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(mode, port, args.workers, args.threads, f"sqlite:///{db_path}",
+                                  args.db_latency, not args.no_catalog_cache)
+            try:
+                wait_until_up(f"{base_url}/test")
+                for path, make_request in scenarios:
+                    result = run_load(make_request, base_url, args.clients, args.duration)
+                    results.append((mode, path, result))
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = [(mode, path, failures(result["statuses"])) for mode, path, result in results
+              if failures(result["statuses"])]
+    if failed:
+        for mode, path, statuses in failed:
+            print(f"{mode} {path}: non-2xx responses {statuses}", file=sys.stderr)
+        sys.exit("benchmark aborted: requests failed, throughput figures would be meaningless")
+
+    print(f"{args.workers} workers, {args.threads} threads/worker (gthread), "
+          f"{args.clients} clients, {args.duration:.0f}s per run, "
+          f"{args.db_latency:g}ms simulated DB latency\n")
+    print(f"{'mode':<8} {'endpoint':<15} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for mode, path, result in results:
+        print(f"{mode:<8} {path:<15} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f}  {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
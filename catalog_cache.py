@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.http import generate_etag
+
+from compression import compress
+
+# Seconds a cached payload may be served before it is rebuilt. Invalidation is
+# immediate inside a worker; the TTL bounds how long other gunicorn workers (or a
+# `flask import-products` run in a separate process) can serve stale data.
+CATALOG_CACHE_TTL = float(os.environ.get("CATALOG_CACHE_TTL", 30))
+
+
+class CatalogEntry:
+    """A serialized catalog body plus the validators used for conditional GETs."""
+
+    __slots__ = ("body", "etag", "last_modified", "_encoded")
+
+    def __init__(self, body, last_modified=None):
+        self.body = body
+        # Content hash rather than the in-process version, so every worker
+        # hands out the same ETag for the same catalog.
+        self.etag = generate_etag(body.encode("utf-8") if isinstance(body, str) else body)
+        self.last_modified = last_modified
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """The body compressed with `encoding`, computed once per entry."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            body = self.body.encode("utf-8") if isinstance(self.body, str) else self.body
+            data = self._encoded[encoding] = compress(body, encoding)
+        return data
+
+
+class CatalogCache:
+    """Versioned in-memory cache of serialized catalog payloads.
+
+    Entries are keyed by category ("all" for the full list) and hold a
+    CatalogEntry with the JSON body exactly as it is sent to the client.
+    Every write to the product table bumps the version, which drops all
+    entries at once.
+    """
+
+    def __init__(self, ttl=CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}
+        # key -> (etag, last modified); survives invalidation
+        self._last_modified = {}
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, stored_at, value = entry
+        if version != self._version or time.monotonic() - stored_at > self.ttl:
+            return None
+        return value
+
+    def set(self, key, value, version):
+        """Store a value built while the cache was at `version`.
+
+        If the catalog changed while the value was being built, it is already
+        stale and is discarded.
+        """
+        with self._lock:
+            if version != self._version:
+                return False
+            self._entries[key] = (version, time.monotonic(), value)
+            return True
+
+    def last_modified(self, key, etag):
+        """When the payload for `key` last changed, as far as this worker has seen.
+
+        That is the build time of the first entry with this `etag`. The
+        newest row's updated_at would miss deletes, which leave it where it
+        was, so If-Modified-Since alone would get a 304 for a changed catalog.
+        """
+        now = datetime.utcnow().replace(microsecond=0)
+        with self._lock:
+            seen = self._last_modified.get(key)
+            if seen is not None:
+                if seen[0] == etag:
+                    return seen[1]
+                # HTTP dates have one-second resolution
+                now = max(now, seen[1] + timedelta(seconds=1))
+            self._last_modified[key] = (etag, now)
+            return now
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+def mark_catalog_dirty(session):
+    """Flag `session` so the catalog cache is invalidated when it commits.
+
+    Needed for statements run on ``session.connection()`` directly, which the
+    ORM listeners below cannot see.
+    """
+    session.info["catalog_dirty"] = True
+
+
+def invalidate_on_write(model, cache=catalog_cache):
+    """Invalidate `cache` whenever a committed transaction wrote to `model`.
+
+    Covers unit-of-work changes (add/update/delete of instances) as well as
+    bulk ``update(model)`` / ``query.delete()`` statements.
+    """
+    @event.listens_for(Session, "after_flush")
+    def _after_flush(session, flush_context):
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, model):
+                mark_catalog_dirty(session)
+                break
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _do_orm_execute(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is model:
+            mark_catalog_dirty(orm_execute_state.session)
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        if session.info.pop("catalog_dirty", False):
+            cache.invalidate()
+
+    @event.listens_for(Session, "after_soft_rollback")
+    def _after_rollback(session, previous_transaction):
+        # A rolled-back SAVEPOINT (e.g. one failed job in a WriteQueue batch)
+        # must not discard writes the outer transaction still commits
+        if previous_transaction.nested or previous_transaction.parent is not None:
+            return
+        session.info.pop("catalog_dirty", None)
@@ -0,0 +1,122 @@
+"""Accept-Encoding negotiated compression for JSON and CSV responses.
+
+Environment:
+
+  COMPRESS_MIN_SIZE   bytes below which responses are sent as-is (default 1024)
+  COMPRESS_LEVEL      gzip level (default 6)
+  BROTLI_QUALITY      brotli quality (default 5); brotli is used when the
+                      `brotli` package is installed and the client accepts it
+
+Streamed responses (the CSV export) are compressed chunk by chunk as they
+are sent. Catalog payloads are compressed once per cached entry instead of
+per request, see CatalogEntry.encoded().
+"""
+import gzip
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli`
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/csv"}
+
+# Preferred first when the client rates them equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding():
+    """The best encoding the current request accepts, or None."""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accepted[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        feed, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        feed, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = feed(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def _compressible(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and "Content-Encoding" not in response.headers
+        and not response.direct_passthrough
+    )
+
+
+def _mark_encoded(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    # The ETag was computed over the identity body; a byte-different
+    # representation may only carry a weak one
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def use_precompressed(response, entry):
+    """Swap in `entry`'s cached compressed body if the client accepts one."""
+    if not _compressible(response) or response.content_length is None:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None or response.content_length < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(entry.encoded(encoding))
+    _mark_encoded(response, encoding)
+    return response
+
+
+def init_compression(app):
+    """Compress eligible responses after every request."""
+
+    @app.after_request
+    def _compress_response(response):
+        if not _compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            if response.content_length is None or response.content_length < COMPRESS_MIN_SIZE:
+                return response
+            response.set_data(compress(response.get_data(), encoding))
+        _mark_encoded(response, encoding)
+        return response
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from utils import env_bool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._in_get = threading.local()
+        self.reset_wait_stats()
+
+    def reset_wait_stats(self):
+        with self._stats_lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def _do_get(self):
+        # QueuePool._do_get() retries by calling itself; only time the outer call
+        if getattr(self._in_get, "active", False):
+            return super()._do_get()
+        self._in_get.active = True
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self._in_get.active = False
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_url`, driven by environment variables.
+
+      DB_POOL_SIZE             persistent connections per worker (default 5)
+      DB_MAX_OVERFLOW          extra connections allowed under burst (default 10)
+      DB_POOL_TIMEOUT          seconds to wait for a free connection (default 10)
+      DB_POOL_RECYCLE          seconds before a connection is replaced (default 1800)
+      DB_POOL_PRE_PING         test connections before use (default true)
+      DB_STATEMENT_TIMEOUT_MS  Postgres statement_timeout (default 30000, 0 = off)
+    """
+    if database_url.startswith("sqlite"):
+        # SQLite connections are file handles; pool sizing doesn't apply
+        return {}
+
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+    }
+    statement_timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 30000))
+    if database_url.startswith("postgresql") and statement_timeout:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def pool_stats(engine):
+    """Snapshot of this worker's connection pool."""
+    pool = engine.pool
+    stats = {
+        "pid": os.getpid(),
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "avg_wait_ms": round(pool.total_wait / pool.checkouts * 1000, 3) if pool.checkouts else 0,
+                "max_wait_ms": round(pool.max_wait * 1000, 3),
+            })
+    return stats
@@ -1,70 +1,252 @@
-import requests
+"""Fetch placeholder product images into kiosk-frontend/public/images.
+
+The image list comes from the Product.image column, so it follows whatever
+`flask import-products` loaded. Images are fetched concurrently over one
+pooled HTTP session:
+
+    python download_images.py
+    python download_images.py --workers 8 --base-url http://127.0.0.1:8000
+
+Downloads are stored once, under their SHA-256, in a content-addressed cache
+(.image-cache/ by default) and copied into the images directory. The cache's
+manifest.json records each image's hash, ETag and Last-Modified. Re-runs send
+conditional requests, so unchanged images cost a 304 and no body. An
+interrupted run picks up where it stopped because the manifest is saved
+after every image.
+
+Failed requests are retried with exponential backoff. A 429 or 503 slows
+every worker down (honouring Retry-After), and the pace recovers gradually
+as requests succeed.
+"""
+import argparse
+import hashlib
+import json
 import os
+import random
+import shutil
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+IMAGES_DIR = os.path.join(BASE_DIR, "kiosk-frontend", "public", "images")
+CACHE_DIR = os.path.join(BASE_DIR, ".image-cache")
+BASE_URL = "https://placehold.co"
+PLACEHOLDER = ("placeholder-image.jpg", "Product")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AdaptiveRateLimiter:
+    """Shared pacing between requests: backs off on 429/503, recovers on success."""
+
+    def __init__(self, min_interval=0.0, max_interval=30.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def throttled(self, retry_after=None):
+        with self._lock:
+            self.interval = min(self.max_interval, max(self.interval * 2, 0.25))
+            if retry_after:
+                self._next_slot = max(self._next_slot, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval * 0.9)
+
+
+class Manifest:
+    """image name -> {sha256, etag, last_modified, url, size}, saved atomically."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, name):
+        with self._lock:
+            return dict(self.entries.get(name, {}))
+
+    def update(self, name, entry):
+        with self._lock:
+            self.entries[name] = entry
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "grocer-go-image-fetcher"
+    return session
+
 
-# Create images directory if it doesn't exist
-images_dir = 'kiosk-frontend/public/images'
-os.makedirs(images_dir, exist_ok=True)
-
-# List of all required images from add_products.py
-image_names = [
-    'rice.jpg', 'wheat.jpg', 'barley.jpg', 'oats.jpg', 'corn.jpg', 'millet.jpg',
-    'moong.jpg', 'chana.jpg', 'toor.jpg', 'urad.jpg', 'rajma.jpg', 'chickpeas.jpg',
-    'potatoes.jpg', 'tomatoes.jpg', 'onions.jpg', 'carrots.jpg', 'cauliflower.jpg', 
-    'spinach.jpg', 'okra.jpg', 'eggplant.jpg', 'apples.jpg', 'bananas.jpg',
-    'oranges.jpg', 'mangoes.jpg', 'grapes.jpg', 'watermelon.jpg', 'pineapple.jpg',
-    'pomegranate.jpg', 'milk.jpg', 'yogurt.jpg', 'cheese.jpg', 'butter.jpg',
-    'paneer.jpg', 'ghee.jpg'
-]
-
-# Create default placeholder image first
-default_placeholder_path = os.path.join(images_dir, 'placeholder-image.jpg')
-if not os.path.exists(default_placeholder_path):
+def blob_path(cache_dir, sha256):
+    return os.path.join(cache_dir, "blobs", sha256[:2], sha256)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
     try:
-        print("Downloading default placeholder image...")
-        response = requests.get("https://placehold.co/300x300?text=Product")
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def fetch(session, url, headers, limiter, retries=4, timeout=15):
+    """GET `url`, retrying transient failures; returns the final response."""
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                if response.status_code < 400:
+                    limiter.succeeded()
+                return response
+            if response.status_code in (429, 503):
+                limiter.throttled(_retry_after(response))
+        # Exponential backoff with jitter: ~0.5s, 1s, 2s, 4s
+        time.sleep((2 ** attempt) * 0.5 * random.uniform(0.5, 1.5))
+
+
+def download_image(session, name, text, base_url, images_dir, cache_dir, manifest, limiter):
+    """Bring images_dir/<name> up to date; returns "downloaded", "not modified" or "unchanged"."""
+    url = f"{base_url.rstrip('/')}/300x300?text={quote(text)}"
+    entry = manifest.get(name)
+    cached_blob = blob_path(cache_dir, entry["sha256"]) if entry.get("sha256") else None
+
+    headers = {}
+    if cached_blob and os.path.exists(cached_blob) and entry.get("url") == url:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = fetch(session, url, headers, limiter)
+    target = os.path.join(images_dir, name)
+    if response.status_code == 304:
+        status = "not modified"
+    else:
         response.raise_for_status()
-        
-        with open(default_placeholder_path, 'wb') as f:
-            f.write(response.content)
-            
-        print("Default placeholder image created successfully!")
-    except Exception as e:
-        print(f"Error creating default placeholder: {e}")
-
-# Download placeholder images
-for image_name in image_names:
-    # Extract product name without extension
-    product_name = image_name.split('.')[0].capitalize()
-    
-    # Create file path
-    file_path = os.path.join(images_dir, image_name)
-    
-    # Skip if file already exists
-    if os.path.exists(file_path):
-        print(f"Skipping existing image: {image_name}")
-        continue
-    
-    # Use placeholder image service
-    url = f"https://placehold.co/300x300?text={product_name}"
-    
-    try:
-        # Download image
-        print(f"Downloading: {image_name}")
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad responses
-        
-        # Save image to file
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        
-        print(f"Downloaded: {image_name}")
-        
-        # Sleep a bit to avoid hitting rate limits
-        time.sleep(0.5)
-        
-    except Exception as e:
-        print(f"Error downloading {image_name}: {e}")
-
-print("\nAll placeholder images have been downloaded!")
-print(f"Images saved to: {os.path.abspath(images_dir)}") 
\ No newline at end of file
+        data = response.content
+        sha256 = hashlib.sha256(data).hexdigest()
+        cached_blob = blob_path(cache_dir, sha256)
+        if not os.path.exists(cached_blob):
+            os.makedirs(os.path.dirname(cached_blob), exist_ok=True)
+            tmp = f"{cached_blob}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, cached_blob)
+        status = "unchanged" if sha256 == entry.get("sha256") else "downloaded"
+        entry = {
+            "url": url,
+            "sha256": sha256,
+            "size": len(data),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    # Copy out of the cache only when the served file differs from it
+    if not os.path.exists(target) or _file_sha256(target) != entry["sha256"]:
+        shutil.copyfile(cached_blob, target)
+    manifest.update(name, entry)
+    return status
+
+
+def _file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def product_images():
+    """(file name, label) for every distinct Product.image, from the app's database."""
+    from app import app, Product
+
+    with app.app_context():
+        rows = Product.query.with_entities(Product.image, Product.name).filter(Product.image.isnot(None)).all()
+    images = {}
+    for image, name in rows:
+        file_name = os.path.basename(image)
+        if file_name:
+            images.setdefault(file_name, name)
+    return sorted(images.items())
+
+
+def download_all(images, base_url=BASE_URL, images_dir=IMAGES_DIR, cache_dir=CACHE_DIR,
+                 workers=4, min_interval=0.0):
+    """Fetch `images` ((file name, label) pairs) concurrently; returns {name: status or error}."""
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(cache_dir, "manifest.json"))
+    limiter = AdaptiveRateLimiter(min_interval=min_interval)
+    results = {}
+    with make_session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        futures = {
+            pool.submit(download_image, session, name, text, base_url, images_dir, cache_dir, manifest, limiter): name
+            for name, text in images
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = f"error: {e}"
+            print(f"{name}: {results[name]}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.environ.get("IMAGE_BASE_URL", BASE_URL))
+    parser.add_argument("--images-dir", default=IMAGES_DIR)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--min-interval", type=float, default=0.0,
+                        help="minimum seconds between requests across all workers")
+    args = parser.parse_args()
+
+    images = [PLACEHOLDER] + product_images()
+    results = download_all(images, args.base_url, args.images_dir, args.cache_dir,
+                           args.workers, args.min_interval)
+
+    failed = [name for name, status in results.items() if status.startswith("error")]
+    counts = {}
+    for status in results.values():
+        key = "failed" if status.startswith("error") else status
+        counts[key] = counts.get(key, 0) + 1
+    print(f"\n{len(results)} images: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    print(f"Images saved to: {os.path.abspath(args.images_dir)}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Live change events for /api/stream (Server-Sent Events).
+
+Writers call publish() inside their transaction. The event is stored as an
+event_log row and commits or rolls back together with the change it
+describes. Every worker runs one poller thread. The poller tails event_log,
+and a commit in the same worker wakes it at once. New events go into an
+in-process replay buffer and are fanned out to that worker's connected
+clients. Because event ids come from the table, they mean the same thing
+in every worker. A client that reconnects with Last-Event-ID therefore gets
+what it missed, whichever worker it lands on. When the id is older than
+the buffer, the client gets a `reset` event instead and should refetch
+from the REST endpoints.
+
+Each client has a bounded queue. A client that falls STREAM_CLIENT_QUEUE
+events behind is disconnected rather than buffered without limit. It
+catches up from the replay buffer when it reconnects.
+
+Environment:
+
+  STREAM_REPLAY_SIZE      events kept per worker for Last-Event-ID replay (default 1000)
+  STREAM_CLIENT_QUEUE     undelivered events a client may fall behind by (default 256)
+  STREAM_MAX_CLIENTS      open streams per worker (default 16; 500 under gevent, 0 with
+                          sync workers, which a stream would block; see gunicorn.conf.py)
+  STREAM_POLL_INTERVAL    seconds between event_log polls (default 1)
+  STREAM_HEARTBEAT        seconds between keep-alive comments (default 15)
+  STREAM_MAX_DURATION     seconds before a stream is closed for the client to resume (default 300)
+  STREAM_RETENTION        seconds event_log rows are kept (default 3600)
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session
+
+from models import db, EventLog
+from utils import start_per_process_thread
+
+logger = logging.getLogger(__name__)
+
+STREAM_REPLAY_SIZE = int(os.environ.get("STREAM_REPLAY_SIZE", 1000))
+STREAM_CLIENT_QUEUE = int(os.environ.get("STREAM_CLIENT_QUEUE", 256))
+# gunicorn.conf.py sizes this per worker class and adds as many gthread
+# threads, so streams never take the threads regular requests need
+STREAM_MAX_CLIENTS = int(os.environ.get("STREAM_MAX_CLIENTS", 16))
+STREAM_POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", 1))
+STREAM_HEARTBEAT = float(os.environ.get("STREAM_HEARTBEAT", 15))
+STREAM_MAX_DURATION = float(os.environ.get("STREAM_MAX_DURATION", 300))
+STREAM_RETENTION = int(os.environ.get("STREAM_RETENTION", 3600))
+STREAM_PRUNE_INTERVAL = 300
+# Postgres ids can commit out of order; re-read this many below the high-water mark
+STREAM_LOOKBACK = 100
+
+EVENT_TYPES = ("order-created", "order-status-changed", "stock-changed")
+
+StreamEvent = namedtuple("StreamEvent", ["id", "event", "data"])
+
+
+def publish(event_type, data):
+    """Record `event_type` with JSON-serializable `data` in the current transaction."""
+    db.session.add(EventLog(event=event_type, data=current_app.json.dumps(data)))
+    db.session.info["events_published"] = True
+
+
+def format_event(stream_event):
+    lines = [f"id: {stream_event.id}", f"event: {stream_event.event}"]
+    lines += [f"data: {line}" for line in stream_event.data.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    """One connected client: the event types it wants and its bounded queue."""
+
+    def __init__(self, event_types, size=STREAM_CLIENT_QUEUE):
+        self.event_types = frozenset(event_types)
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+
+    def offer(self, stream_event):
+        if stream_event.event not in self.event_types or self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(stream_event)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventBroker:
+    """Per-worker fan-out of event_log rows to connected stream clients."""
+
+    def __init__(self, replay_size=STREAM_REPLAY_SIZE, poll_interval=STREAM_POLL_INTERVAL):
+        self.replay_size = replay_size
+        self.poll_interval = poll_interval
+        self.app = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._buffer = deque()
+        self._buffered_ids = set()
+        # Highest id that is no longer (or never was) in the buffer
+        self._floor = 0
+        self._last_id = 0
+        self._last_prune = 0.0
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, event_types, last_event_id=None):
+        """Register a client; returns (subscriber, events to replay).
+
+        The replay list is None when `last_event_id` is older than the
+        buffer, meaning the client has to resynchronise.
+        """
+        self._ensure_started()
+        subscriber = Subscriber(event_types)
+        with self._lock:
+            replay = []
+            if last_event_id is not None:
+                if last_event_id < self._floor:
+                    replay = None
+                else:
+                    replay = [e for e in self._buffer if e.id > last_event_id and e.event in subscriber.event_types]
+            self._subscribers.add(subscriber)
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def wake(self):
+        self._wake.set()
+
+    def _ensure_started(self):
+        start_per_process_thread("event-poller", self._run, before_start=self._reset)
+
+    def _reset(self):
+        # Clients and buffer inherited from the parent process belong to it
+        with self._lock:
+            self._subscribers = set()
+            self._last_prune = time.monotonic()
+            with self.app.app_context():
+                try:
+                    self._prime()
+                finally:
+                    db.session.remove()
+
+    def _prime(self):
+        rows = db.session.execute(
+            select(EventLog.id, EventLog.event, EventLog.data).order_by(EventLog.id.desc()).limit(self.replay_size)
+        ).all()
+        self._buffer = deque(StreamEvent(*row) for row in reversed(rows))
+        self._buffered_ids = {e.id for e in self._buffer}
+        self._last_id = self._buffer[-1].id if self._buffer else 0
+        # Older events may have been pruned; don't claim to be able to replay them
+        self._floor = self._buffer[0].id - 1 if self._buffer else 0
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    self._poll()
+                    if time.monotonic() - self._last_prune > STREAM_PRUNE_INTERVAL:
+                        self._prune()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Event stream poll failed: %s", e)
+                finally:
+                    db.session.remove()
+
+    def _poll(self):
+        rows = db.session.execute(
+            select(EventLog.id, EventLog.event, EventLog.data)
+            .where(EventLog.id > max(self._last_id - STREAM_LOOKBACK, self._floor))
+            .order_by(EventLog.id)
+        ).all()
+        with self._lock:
+            for row in rows:
+                if row.id in self._buffered_ids:
+                    continue
+                stream_event = StreamEvent(*row)
+                self._buffer.append(stream_event)
+                self._buffered_ids.add(stream_event.id)
+                self._last_id = max(self._last_id, stream_event.id)
+                while len(self._buffer) > self.replay_size:
+                    evicted = self._buffer.popleft()
+                    self._buffered_ids.discard(evicted.id)
+                    self._floor = max(self._floor, evicted.id)
+                for subscriber in self._subscribers:
+                    subscriber.offer(stream_event)
+
+    def _prune(self):
+        self._last_prune = time.monotonic()
+        # Start a fresh transaction: on SQLite, upgrading the poll's read
+        # transaction to a write fails outright if another worker wrote since
+        db.session.commit()
+        cutoff = datetime.utcnow() - timedelta(seconds=STREAM_RETENTION)
+        # Never the newest row, so ids keep increasing even after a quiet spell
+        db.session.execute(delete(EventLog).where(EventLog.created_at < cutoff, EventLog.id < self._last_id))
+        db.session.commit()
+
+    def stream(self, subscriber, replay, heartbeat=STREAM_HEARTBEAT, max_duration=STREAM_MAX_DURATION):
+        """Yield the SSE body for `subscriber`, unsubscribing when it ends."""
+        try:
+            yield "retry: 3000\n\n"
+            if replay is None:
+                yield f"id: {self._last_id}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                for stream_event in replay:
+                    yield format_event(stream_event)
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline and not subscriber.overflowed:
+                try:
+                    stream_event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(stream_event)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+broker = EventBroker()
+
+
+def init_events(app):
+    """Wake the worker's poller as soon as a transaction that published events commits."""
+    broker.app = app
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        if session.info.pop("events_published", False):
+            broker.wake()
+
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop("events_published", None)
+
+    return broker
@@ -0,0 +1,89 @@
+# Gunicorn configuration, loaded automatically by `gunicorn app:app` from this
+# directory (render.yaml passes it explicitly with -c).
+#
+# Defaults to threaded (gthread) workers so a request waiting on the database
+# or building an export doesn't tie up a whole process. Every setting can be
+# overridden through the environment:
+#
+#   WEB_CONCURRENCY          worker processes (default: 2 x CPU + 1)
+#   GUNICORN_THREADS         threads per worker for regular requests (default: 4)
+#   GUNICORN_WORKER_CLASS    gthread (default), sync, or gevent (needs `pip install gevent`,
+#                            plus psycogreen on Postgres so psycopg2 doesn't block the hub)
+#   STREAM_MAX_CLIENTS       open /api/stream clients per worker (default: 16 with gthread,
+#                            500 with gevent, 0 with sync). Every stream holds a thread or
+#                            connection for minutes, so this many are added on top of
+#                            GUNICORN_THREADS / GUNICORN_WORKER_CONNECTIONS. Size it to
+#                            (kiosks + dashboards) / WEB_CONCURRENCY plus headroom.
+#   GUNICORN_TIMEOUT         seconds before a silent worker is killed (default: 60)
+#   GUNICORN_GRACEFUL_TIMEOUT  seconds in-flight requests get on restart (default: 120)
+#   GUNICORN_PRELOAD         "1" to import the app once in the master before forking
+#   METRICS_DIR              where workers share /metrics counters (default: a fresh temp dir)
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Exported so the app (events.py) enforces the same limit the pool is sized for
+stream_clients = int(os.environ.setdefault(
+    "STREAM_MAX_CLIENTS", {"gthread": "16", "gevent": "500"}.get(worker_class, "0")
+))
+# Gunicorn silently swaps sync workers for gthread when threads > 1
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) + stream_clients if worker_class == "gthread" else 1
+if worker_class == "gevent":
+    # Greenlets are cheap; allow many concurrent requests per worker
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200)) + stream_clients
+
+# gthread and gevent workers heartbeat from their main loop, so a long
+# /api/export-orders request does not count against this timeout the way it
+# does with sync workers; it only catches genuinely hung workers.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+# On deploys and HUP reloads, give running exports time to finish
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 120))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+# Recycle workers now and then to bound slow memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+
+# Set before any worker imports the app so they all write metrics to the same place
+metrics_dir = os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"grocer-go-metrics-{os.getpid()}")
+)
+
+
+def on_starting(server):
+    # Counters from a previous run would otherwise be added to this one's
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(path)
+    # child_exit runs from the SIGCHLD handler, where importing is unsafe
+    import metrics  # noqa: F401
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (while preloading the app) are shared
+    # sockets after fork; drop them from this worker's pool without closing
+    # them, so the master's copies stay intact and the worker opens its own
+    if preload_app:
+        from app import app, db
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    from metrics import registry
+    registry.flush()
+
+
+def child_exit(server, worker):
+    # Keep a recycled worker's counts so /metrics totals never go backwards
+    from metrics import archive_worker
+    archive_worker(worker.pid, metrics_dir)
@@ -0,0 +1,234 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, IdempotencyKey
+from sqlite_tuning import begin_immediate
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))
+# Seconds after which an unfinished claim counts as abandoned (its worker was
+# killed or timed out) and may be taken over; keep it above the request timeout
+IDEMPOTENCY_LEASE = int(os.environ.get("IDEMPOTENCY_LEASE", 2 * int(os.environ.get("GUNICORN_TIMEOUT", 60))))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+# Purge expired keys from the database after this many new keys per worker
+PURGE_EVERY = 100
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_recent = LRUCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL)
+_new_keys = 0
+
+
+def _replay(endpoint, request_hash, stored):
+    stored_endpoint, stored_hash, status_code, body = stored
+    if stored_endpoint != endpoint or stored_hash != request_hash:
+        return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+    response = current_app.response_class(body, status=status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _busy():
+    return jsonify({"error": "The server is busy, please retry"}), 503, {"Retry-After": "1"}
+
+
+def _release(key):
+    """Drop a claimed key so a retry can run the request again."""
+    try:
+        db.session.rollback()
+        begin_immediate(db.session)
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Error releasing idempotency key %s: %s", key, e)
+
+
+def _reclaim(key, endpoint, request_hash):
+    """Take over a claim whose request never finished; True if this request now owns it.
+
+    The guarded UPDATE lets exactly one of several concurrent retries win.
+    """
+    now = datetime.utcnow()
+    begin_immediate(db.session)
+    result = db.session.execute(
+        db.update(IdempotencyKey)
+        .where(IdempotencyKey.key == key,
+               IdempotencyKey.status_code.is_(None),
+               IdempotencyKey.created_at < now - timedelta(seconds=IDEMPOTENCY_LEASE))
+        .values(endpoint=endpoint, request_hash=request_hash, created_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _claim(key, endpoint, request_hash):
+    """Claim `key` for this request; None once the claim is committed.
+
+    Otherwise returns the holder's (endpoint, request_hash, status_code,
+    response_body), status_code being None while it runs, or False if the
+    key was claimed and released under us. Runs in a transaction that
+    takes SQLite's write lock up front: reading the key and then inserting
+    it in a deferred one fails with "database is locked", without waiting,
+    when another request commits in between.
+    """
+    begin_immediate(db.session)
+    record = db.session.get(IdempotencyKey, key)
+    if record is not None and record.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL):
+        db.session.delete(record)
+        db.session.flush()
+        record = None
+    if record is None:
+        try:
+            db.session.add(IdempotencyKey(key=key, endpoint=endpoint, request_hash=request_hash))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            # Only on databases without a write lock at BEGIN
+            db.session.rollback()
+            record = db.session.get(IdempotencyKey, key)
+            if record is None:
+                # Claimed and released again between our insert and read
+                return False
+    stored = (record.endpoint, record.request_hash, record.status_code, record.response_body)
+    db.session.commit()
+    return stored
+
+
+def _store(key, status_code, body):
+    """Record the finished request's response on its claimed key."""
+    # Whatever the view left open is discarded at teardown anyway; a fresh
+    # transaction can take the write lock at BEGIN
+    db.session.rollback()
+    begin_immediate(db.session)
+    db.session.execute(
+        db.update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=body)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _purge_expired():
+    global _new_keys
+    _new_keys += 1
+    if _new_keys % PURGE_EVERY:
+        return
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+    begin_immediate(db.session)
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+    db.session.commit()
+
+
+def idempotent(f):
+    """Replay the stored response when a request repeats its Idempotency-Key.
+
+    The first request with a key claims it by inserting a placeholder row;
+    the primary key constraint decides between concurrent duplicates. The
+    loser gets 409 while the winner is still running, then the winner's
+    response once it has finished. Server errors release the key so the
+    client can retry, and a claim left unfinished for IDEMPOTENCY_LEASE
+    seconds (its worker died mid-request) is handed to the next retry.
+    When the database is too busy to claim the key or store the response,
+    the key is left (or made) free again and the client gets a 503 to retry.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        endpoint = request.endpoint
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        stored = _recent.get(key)
+        if stored is not None:
+            return _replay(endpoint, request_hash, stored)
+
+        try:
+            stored = _claim(key, endpoint, request_hash)
+            if stored is False:
+                return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+            if stored is not None and stored[2] is None:
+                if not _reclaim(key, endpoint, request_hash):
+                    return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+                logger.warning("Reclaimed abandoned Idempotency-Key %s", key)
+                stored = None
+        except OperationalError as e:
+            db.session.rollback()
+            logger.error("Error claiming idempotency key %s: %s", key, e)
+            return _busy()
+
+        if stored is not None:
+            _recent.set(key, stored)
+            return _replay(endpoint, request_hash, stored)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(key)
+            raise
+
+        if response.status_code >= 500:
+            _release(key)
+            return response
+        body = response.get_data(as_text=True)
+        try:
+            _store(key, response.status_code, body)
+        except OperationalError as e:
+            # Left claimed, every retry would get 409 until the lease ran out
+            logger.error("Error storing idempotent response for key %s: %s", key, e)
+            _release(key)
+            return response
+        _recent.set(key, (endpoint, request_hash, response.status_code, body))
+        try:
+            _purge_expired()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error purging expired idempotency keys: %s", e)
+        return response
+
+    return decorated
@@ -0,0 +1,61 @@
+"""JSON provider for the app: orjson when it's installed, the stdlib otherwise.
+
+JSON_PROVIDER picks the implementation: "auto" (default) uses orjson if it
+can be imported, "orjson" requires it, "json" forces the stdlib. Both render
+datetimes and dates as ISO 8601 (Flask's default provider uses HTTP dates)
+and keep keys in insertion order, so responses look the same either way.
+"""
+import decimal
+import os
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: `pip install orjson`
+    orjson = None
+
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto").lower()
+
+
+def _default(obj):
+    """Types neither encoder handles natively."""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """The stdlib provider, with ISO 8601 dates and unsorted keys."""
+
+    sort_keys = False
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, date):
+            return obj.isoformat()
+        return _default(obj)
+
+
+class OrjsonProvider(JSONProvider):
+    """orjson-backed provider; datetimes, dates, UUIDs and numpy values are native."""
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def make_json_provider(app):
+    """The provider selected by JSON_PROVIDER, bound to `app`."""
+    if JSON_PROVIDER == "orjson" and orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson but orjson is not installed")
+    if orjson is not None and JSON_PROVIDER in ("auto", "orjson"):
+        return OrjsonProvider(app)
+    return ISOJSONProvider(app)
@@ -0,0 +1,123 @@
+"""Logging setup: env-driven levels, JSON output, per-route sampling, and a
+queue so handlers never write to stdout on the request thread.
+
+Environment:
+
+  LOG_LEVEL         root level (default INFO)
+  LOG_LEVELS        per-logger overrides, e.g. "sqlalchemy.engine=INFO,werkzeug=WARNING"
+  LOG_FORMAT        "json" (default) or "text"
+  LOG_SAMPLE_RATES  per-endpoint sampling of sub-WARNING records, e.g.
+                    "get_products=0.01,get_orders=0.1"; warnings and errors
+                    are always kept
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+_listener = None
+
+
+def _parse_pairs(value):
+    pairs = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            name, _, setting = part.partition("=")
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for attr in ("method", "path", "endpoint", "remote_addr"):
+            value = getattr(record, attr, None)
+            if value is not None:
+                entry[attr] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the current request and applies per-route sampling.
+
+    Runs on the request thread before a record is queued, since the request
+    context isn't available on the listener thread. The sampling decision is
+    made once per request so a sampled request keeps all of its log lines.
+    """
+
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.method = request.method
+        record.path = request.path
+        record.endpoint = request.endpoint
+        record.remote_addr = request.remote_addr
+
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(request.endpoint)
+        if rate is None:
+            return True
+        sampled = g.get("_log_sampled")
+        if sampled is None:
+            sampled = g._log_sampled = random.random() < rate
+        return sampled
+
+
+def _start_listener(log_queue, handler):
+    global _listener
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging():
+    """Install the queue-backed root handler. Safe to call more than once."""
+    if _listener is not None:
+        return
+
+    level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    sample_rates = {name: float(rate) for name, rate in _parse_pairs(os.environ.get("LOG_SAMPLE_RATES")).items()}
+
+    output = logging.StreamHandler(sys.stdout)
+    if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JSONFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name, logger_level in _parse_pairs(os.environ.get("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+
+    _start_listener(log_queue, output)
+    atexit.register(lambda: _listener.stop())
+    # The listener thread doesn't survive fork (gunicorn preload); restart it
+    # in each child so queued records keep draining
+    os.register_at_fork(after_in_child=lambda: _start_listener(log_queue, output))
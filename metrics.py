@@ -0,0 +1,262 @@
+"""Per-request metrics exposed in Prometheus text format.
+
+Records, per endpoint: request latency, status counts, response sizes, and
+the number of SQL statements and time spent in the database while serving
+the request (counted with engine cursor events).
+
+Each gunicorn worker keeps its own counters. When METRICS_DIR is set
+(gunicorn.conf.py sets it for every worker) a background thread
+writes them to METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds;
+/metrics sums every file it finds there, so whichever worker answers the
+scrape reports totals for the whole server. Files of exited workers are
+folded into METRICS_DIR/archive.json by gunicorn's child_exit hook so the
+counters stay monotonic across worker restarts.
+"""
+import json
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from utils import start_per_process_thread
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1))
+ARCHIVE_FILE = "archive.json"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "http_requests_total": (
+        "counter", "Requests served, by endpoint and status.", None),
+    "http_request_duration_seconds": (
+        "histogram", "Time from request start until the response is returned to the server.", LATENCY_BUCKETS),
+    "http_response_size_bytes": (
+        "histogram", "Response body size (streamed responses are not counted).", SIZE_BUCKETS),
+    "db_queries_per_request": (
+        "histogram", "SQL statements executed while serving a request.", QUERY_COUNT_BUCKETS),
+    "db_query_duration_seconds": (
+        "histogram", "Total time spent in SQL statements per request.", LATENCY_BUCKETS),
+    "db_queries_total": (
+        "counter", "SQL statements executed, by endpoint.", None),
+}
+
+
+class MetricsRegistry:
+    """Counters and histograms for one process, keyed by (name, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        # key -> [per-bucket counts (last one is +Inf), sum, count]
+        self._histograms = {}
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            index = len(buckets)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    index = i
+                    break
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """JSON-serialisable copy of every series."""
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), list(counts), total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()],
+            }
+
+    def flush(self):
+        """Write this worker's snapshot to METRICS_DIR."""
+        if METRICS_DIR:
+            _write_json(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), self.snapshot())
+
+    def start_flusher(self):
+        """Flush every METRICS_FLUSH_INTERVAL seconds from a background thread.
+
+        Keeps file I/O off the request path, and makes sure an idle worker's
+        last requests still reach the file. Called per request; starts one
+        thread per worker.
+        """
+        if METRICS_DIR:
+            start_per_process_thread("metrics-flusher", self._flush_loop)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+
+registry = MetricsRegistry()
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get("counters", []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot.get("histograms", []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = [list(counts), total, count]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+    return counters, histograms
+
+
+def _collect():
+    if not METRICS_DIR:
+        return _merge([registry.snapshot()])
+    registry.flush()
+    snapshots = []
+    for filename in os.listdir(METRICS_DIR):
+        if filename.endswith(".json"):
+            snapshot = _read_json(os.path.join(METRICS_DIR, filename))
+            if snapshot:
+                snapshots.append(snapshot)
+    return _merge(snapshots)
+
+
+def archive_worker(pid, metrics_dir=METRICS_DIR):
+    """Fold an exited worker's counters into archive.json (gunicorn child_exit)."""
+    if not metrics_dir:
+        return
+    path = os.path.join(metrics_dir, f"{pid}.json")
+    snapshot = _read_json(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(metrics_dir, ARCHIVE_FILE)
+    counters, histograms = _merge([_read_json(archive_path) or {}, snapshot])
+    _write_json(archive_path, {
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), counts, total, count]
+                       for (name, labels), (counts, total, count) in histograms.items()],
+    })
+    os.remove(path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """Every metric, summed across workers, in Prometheus text format 0.0.4."""
+    counters, histograms = _collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+        for (series_name, labels), (counts, total, count) in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app, db):
+    """Install the request hooks on `app` and the query counters on its engine."""
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        # Background threads (the SQLite write queue) have no request to charge
+        if has_request_context() and "_metrics_started" in g:
+            g._metrics_queries += 1
+            g._metrics_db_time += elapsed
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = 0
+        g._metrics_db_time = 0.0
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        # Unmatched URLs share one label so scanners can't explode the series count
+        endpoint = request.endpoint or "unmatched"
+        registry.inc("http_requests_total", (
+            ("method", request.method), ("endpoint", endpoint), ("status", str(response.status_code))))
+        registry.observe("http_request_duration_seconds",
+                         (("method", request.method), ("endpoint", endpoint)), time.perf_counter() - started)
+        if response.content_length is not None:
+            registry.observe("http_response_size_bytes", (("endpoint", endpoint),), response.content_length)
+        registry.observe("db_queries_per_request", (("endpoint", endpoint),), g._metrics_queries)
+        registry.observe("db_query_duration_seconds", (("endpoint", endpoint),), g._metrics_db_time)
+        if g._metrics_queries:
+            registry.inc("db_queries_total", (("endpoint", endpoint),), g._metrics_queries)
+        registry.start_flusher()
+        return response
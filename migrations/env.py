@@ -90,13 +90,31 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # The product search index is created with raw SQL and isn't part of the
+    # models (see dc07533580ee); don't let autogenerate drop it
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == "table" and name.startswith("product_fts"):
+            return False
+        if name in ("search_vector", "ix_product_search_vector"):
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            # Batch migrations recreate tables; with foreign keys enforced,
+            # dropping the old copy would cascade into the child tables. The
+            # pragma is a no-op inside a transaction, so set it on the raw
+            # (autocommit) connection before one starts.
+            connection.connection.dbapi_connection.execute("PRAGMA foreign_keys=OFF")
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +124,9 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            connection.connection.dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
 
 if context.is_offline_mode():
     run_migrations_offline()
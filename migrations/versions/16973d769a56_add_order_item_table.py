@@ -0,0 +1,76 @@
+"""Add order_item table
+
+Revision ID: 16973d769a56
+Revises: 15839c3dde7f
+Create Date: 2026-10-17 09:12:41.318207
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '16973d769a56'
+down_revision = '15839c3dde7f'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    op.create_table('order_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_item_order_id'), 'order_item', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_item_product_id'), 'order_item', ['product_id'], unique=False)
+
+    # Backfill from the JSON items column
+    bind = op.get_bind()
+    order = sa.table('order', sa.column('id', sa.Integer), sa.column('items', sa.Text))
+    order_item = sa.table('order_item',
+        sa.column('order_id', sa.Integer),
+        sa.column('product_id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('unit_price', sa.Float),
+        sa.column('quantity', sa.Integer),
+    )
+    product_ids = {row.id for row in bind.execute(sa.text('SELECT id FROM product'))}
+
+    rows = []
+    for order_id, items in bind.execute(sa.select(order.c.id, order.c['items'])).all():
+        try:
+            items = json.loads(items) if items else []
+        except json.JSONDecodeError:
+            continue
+        for item in items:
+            product_id = item.get('id')
+            rows.append({
+                'order_id': order_id,
+                # Products removed since the order was placed keep their snapshot only
+                'product_id': product_id if product_id in product_ids else None,
+                'name': str(item.get('name', ''))[:100],
+                'unit_price': float(item.get('price') or 0),
+                'quantity': int(item.get('quantity') or 0),
+            })
+        if len(rows) >= BATCH_SIZE:
+            bind.execute(order_item.insert(), rows)
+            rows = []
+    if rows:
+        bind.execute(order_item.insert(), rows)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_order_item_product_id'), table_name='order_item')
+    op.drop_index(op.f('ix_order_item_order_id'), table_name='order_item')
+    op.drop_table('order_item')
@@ -0,0 +1,42 @@
+"""Add stock holds
+
+Revision ID: 17b0320e3cde
+Revises: f5ba57d924a5
+Create Date: 2026-10-17 06:54:10.426324
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '17b0320e3cde'
+down_revision = 'f5ba57d924a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('stock_hold',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cart_id', sa.String(length=64), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cart_id', 'product_id', name='uq_stock_hold_cart_product')
+    )
+    op.create_index(op.f('ix_stock_hold_expires_at'), 'stock_hold', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_stock_hold_product_id'), 'stock_hold', ['product_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stock_hold_product_id'), table_name='stock_hold')
+    op.drop_index(op.f('ix_stock_hold_expires_at'), table_name='stock_hold')
+    op.drop_table('stock_hold')
+    # Plain ALTER TABLE rather than batch mode: recreating the table would
+    # drop the product_fts triggers on SQLite
+    op.drop_column('product', 'reserved')
@@ -0,0 +1,35 @@
+"""Add indexes for hot queries
+
+Revision ID: 1c5faae5b8f7
+Revises: 16973d769a56
+Create Date: 2026-10-17 10:03:27.552910
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5faae5b8f7'
+down_revision = '16973d769a56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Category filters compare lower(category); Postgres and SQLite can both
+    # index the expression, anything else gets a plain column index
+    if op.get_bind().dialect.name in ('postgresql', 'sqlite'):
+        op.create_index('ix_product_category_lower', 'product', [sa.text('lower(category)')], unique=False)
+    else:
+        op.create_index('ix_product_category_lower', 'product', ['category'], unique=False)
+    op.create_index(op.f('ix_order_order_time'), 'order', ['order_time'], unique=False)
+    op.create_index(op.f('ix_order_status'), 'order', ['status'], unique=False)
+    op.create_index('ix_order_status_order_time', 'order', ['status', 'order_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_order_status_order_time', table_name='order')
+    op.drop_index(op.f('ix_order_status'), table_name='order')
+    op.drop_index(op.f('ix_order_order_time'), table_name='order')
+    op.drop_index('ix_product_category_lower', table_name='product')
@@ -0,0 +1,40 @@
+"""Add daily_sales rollup
+
+Revision ID: 95b3905e6c31
+Revises: 1c5faae5b8f7
+Create Date: 2026-10-17 11:20:54.007163
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '95b3905e6c31'
+down_revision = '1c5faae5b8f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate with `flask refresh-sales-rollup` after upgrading
+    op.create_table('daily_sales',
+    sa.Column('sale_date', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('product_name', sa.String(length=100), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('sale_date', 'product_id', 'category')
+    )
+    op.create_table('rollup_state',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_state')
+    op.drop_table('daily_sales')
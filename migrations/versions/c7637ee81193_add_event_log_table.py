@@ -0,0 +1,33 @@
+"""Add event_log table
+
+Revision ID: c7637ee81193
+Revises: 17b0320e3cde
+Create Date: 2026-10-17 06:57:54.824629
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7637ee81193'
+down_revision = '17b0320e3cde'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event', sa.String(length=50), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_event_log_created_at'), 'event_log', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_event_log_created_at'), table_name='event_log')
+    op.drop_table('event_log')
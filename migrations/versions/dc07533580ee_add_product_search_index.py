@@ -0,0 +1,73 @@
+"""Add product search index
+
+Revision ID: dc07533580ee
+Revises: 1a7e42221078
+Create Date: 2026-10-17 06:45:48.580650
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'dc07533580ee'
+down_revision = '1a7e42221078'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # External-content FTS5 table over product(name, description), kept in
+        # sync by triggers; prefix indexes make 2-3 letter type-ahead cheap
+        op.execute(
+            "CREATE VIRTUAL TABLE product_fts USING fts5("
+            "name, description, content='product', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            "CREATE TRIGGER product_fts_ai AFTER INSERT ON product BEGIN "
+            "INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER product_fts_ad AFTER DELETE ON product BEGIN "
+            "INSERT INTO product_fts(product_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); "
+            "END"
+        )
+        # Stock updates don't touch the index
+        op.execute(
+            "CREATE TRIGGER product_fts_au AFTER UPDATE OF name, description ON product BEGIN "
+            "INSERT INTO product_fts(product_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); "
+            "INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+            "END"
+        )
+        op.execute("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.add_column('product', sa.Column(
+            'search_vector', postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+                persisted=True
+            ),
+            nullable=True
+        ))
+        op.create_index('ix_product_search_vector', 'product', ['search_vector'],
+                        unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS product_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS product_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS product_fts_ai")
+        op.execute("DROP TABLE IF EXISTS product_fts")
+    elif dialect == 'postgresql':
+        op.drop_index('ix_product_search_vector', table_name='product', postgresql_using='gin')
+        op.drop_column('product', 'search_vector')
@@ -0,0 +1,44 @@
+"""Add product sku
+
+Revision ID: f5ba57d924a5
+Revises: dc07533580ee
+Create Date: 2026-10-17 06:47:40.657671
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5ba57d924a5'
+down_revision = 'dc07533580ee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('sku', sa.String(length=64), nullable=True))
+
+    # Backfill from the product name (the same slugs sample_products.json
+    # uses), so re-importing the sample catalog matches existing rows
+    conn = op.get_bind()
+    product = sa.table('product', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                       sa.column('sku', sa.String))
+    taken = set()
+    for product_id, name in conn.execute(sa.select(product.c.id, product.c.name).order_by(product.c.id)):
+        sku = re.sub(r'[^a-z0-9]+', '-', (name or '').lower()).strip('-')[:64] or f'product-{product_id}'
+        if sku in taken:
+            sku = f'{sku[:50]}-{product_id}'
+        taken.add(sku)
+        conn.execute(product.update().where(product.c.id == product_id).values(sku=sku))
+
+    op.create_index(op.f('ix_product_sku'), 'product', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_product_sku'), table_name='product')
+    # Plain ALTER TABLE rather than batch mode: recreating the table would
+    # drop the product_fts triggers on SQLite
+    op.drop_column('product', 'sku')
@@ -1,39 +1,133 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-
-db = SQLAlchemy()
-
-class Product(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False, default="Uncategorized")
-    image = db.Column(db.String(255), nullable=True)
-    description = db.Column(db.Text, nullable=True)
-    stock = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-class Order(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.String(20), unique=True, nullable=False)
-    items = db.Column(db.Text, nullable=False)  # JSON string of cart items
-    total_price = db.Column(db.Float, nullable=False)
-    payment_method = db.Column(db.String(50), nullable=False)
-    
-    # Delivery information
-    street = db.Column(db.String(100), nullable=False)
-    city = db.Column(db.String(100), nullable=False)
-    state = db.Column(db.String(100), nullable=False)
-    zip_code = db.Column(db.String(20), nullable=False)
-    
-    # Order status and timestamps
-    status = db.Column(db.String(20), default="pending")
-    order_time = db.Column(db.DateTime, default=datetime.utcnow)
-    expected_delivery = db.Column(db.DateTime, nullable=True)
-    
-    # Additional information
-    customer_name = db.Column(db.String(100), nullable=True)
-    customer_email = db.Column(db.String(100), nullable=True)
-    customer_phone = db.Column(db.String(20), nullable=True)
-    notes = db.Column(db.Text, nullable=True)
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+
+db = SQLAlchemy()
+
+def upsert_insert(entity):
+    """INSERT for `entity` in the engine's dialect, which has on_conflict_do_update()."""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upserts are not supported on {dialect}")
+    return insert(entity)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Supplier/stock-keeping code; the natural key bulk imports upsert on
+    sku = db.Column(db.String(64), unique=True, index=True, nullable=True)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    category = db.Column(db.String(50), nullable=False, default="Uncategorized")
+    image = db.Column(db.String(255), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    stock = db.Column(db.Integer, default=0)
+    # Units held by open carts: the sum of this product's StockHold rows (see reservations.py)
+    reserved = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Category filters compare lower(category), so index the expression
+        db.Index("ix_product_category_lower", db.func.lower(category)),
+    )
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.String(20), unique=True, nullable=False)
+    items = db.Column(db.Text, nullable=False)  # Raw JSON snapshot of the cart as submitted; read order_items instead
+    total_price = db.Column(db.Float, nullable=False)
+    payment_method = db.Column(db.String(50), nullable=False)
+    
+    # Delivery information
+    street = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    state = db.Column(db.String(100), nullable=False)
+    zip_code = db.Column(db.String(20), nullable=False)
+    
+    # Order status and timestamps
+    status = db.Column(db.String(20), default="pending", index=True)
+    order_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    expected_delivery = db.Column(db.DateTime, nullable=True)
+    
+    # Additional information
+    customer_name = db.Column(db.String(100), nullable=True)
+    customer_email = db.Column(db.String(100), nullable=True)
+    customer_phone = db.Column(db.String(20), nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+
+    order_items = db.relationship("OrderItem", backref="order", cascade="all, delete-orphan",
+                                  passive_deletes=True, order_by="OrderItem.id")
+
+    __table_args__ = (
+        db.Index("ix_order_status_order_time", "status", "order_time"),
+    )
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    # Snapshot of the product at order time, so later catalog edits don't rewrite history
+    name = db.Column(db.String(100), nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+class StockHold(db.Model):
+    """Units of a product reserved for a kiosk cart until checkout or `expires_at`."""
+    __tablename__ = "stock_hold"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.String(64), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("cart_id", "product_id", name="uq_stock_hold_cart_product"),
+    )
+
+class DailySales(db.Model):
+    """Per-day sales rollup, maintained by rollup.py."""
+    __tablename__ = "daily_sales"
+
+    sale_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)  # 0 when the product no longer exists
+    category = db.Column(db.String(50), primary_key=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+class RollupState(db.Model):
+    """High-water marks for incremental rollup refreshes."""
+    __tablename__ = "rollup_state"
+
+    name = db.Column(db.String(50), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=True)
+
+class IdempotencyKey(db.Model):
+    """Stored responses for requests sent with an Idempotency-Key header."""
+    __tablename__ = "idempotency_key"
+
+    key = db.Column(db.String(255), primary_key=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)  # NULL while the first request is still running
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class EventLog(db.Model):
+    """Change events for /api/stream, shared between workers (see events.py)."""
+    __tablename__ = "event_log"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event = db.Column(db.String(50), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # Ids are the stream's Last-Event-IDs, so SQLite must never reuse them
+    __table_args__ = {"sqlite_autoincrement": True}
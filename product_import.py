@@ -0,0 +1,303 @@
+"""Bulk product import: stream a CSV, JSON or XLSX catalog into the product table.
+
+Rows are matched to existing products by `sku` and written with a batched
+INSERT ... ON CONFLICT (sku) DO UPDATE, so product ids, and with them the
+order history that points at them, survive every import. Only columns
+present in the file are updated: a supplier price list with just
+sku/name/price leaves stock, images and descriptions alone. A blank cell in
+an optional column does the same for that row, and a new product gets the
+column's default.
+
+Each batch is committed on its own to keep write locks short while the app
+keeps serving. Unchanged rows aren't written at all. A batch that can't get
+the database (it stays locked past busy_timeout) is retried
+IMPORT_RETRIES times, then reported as failed and left for the next run.
+
+Files are read one row at a time: CSV, XLSX (read-only mode) and JSON Lines
+always, JSON arrays when the optional `ijson` package is installed. Without
+it a .json file is loaded whole, so convert large catalogs to .jsonl.
+
+    flask import-products sample_products.json
+    flask import-products supplier.xlsx --dry-run
+"""
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from openpyxl import load_workbook
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+try:
+    import ijson
+except ImportError:  # optional: `pip install ijson` to stream .json arrays
+    ijson = None
+
+from catalog_cache import mark_catalog_dirty
+from models import db, upsert_insert, Product
+from reservations import publish_stock_changes
+from sqlite_tuning import begin_immediate
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+IMPORT_RETRIES = int(os.environ.get("IMPORT_RETRIES", 3))
+
+# column -> (type, required, max length)
+IMPORT_COLUMNS = {
+    "sku": (str, True, 64),
+    "name": (str, True, 100),
+    "price": (float, True, None),
+    "category": (str, False, 50),
+    "image": (str, False, 255),
+    "description": (str, False, None),
+    "stock": (int, False, None),
+}
+
+
+@dataclass
+class ImportReport:
+    created: list = field(default_factory=list)
+    # (sku, {column: (old, new)})
+    updated: list = field(default_factory=list)
+    unchanged: int = 0
+    # (record number, message)
+    errors: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+    # skus of batches that could not be written
+    failed: list = field(default_factory=list)
+
+    def summary(self):
+        return (f"{len(self.created)} created, {len(self.updated)} updated, {self.unchanged} unchanged, "
+                f"{len(self.errors)} invalid, {len(self.failed)} failed, "
+                f"{len(self.missing)} in the database but not in the file")
+
+    def lines(self, limit=50):
+        """Human-readable diff, at most `limit` lines per section."""
+        out = [self.summary()]
+        for sku in self.created[:limit]:
+            out.append(f"  + {sku}")
+        for sku, changes in self.updated[:limit]:
+            diff = ", ".join(f"{column}: {old!r} -> {new!r}" for column, (old, new) in changes.items())
+            out.append(f"  ~ {sku}: {diff}")
+        for row_number, message in self.errors[:limit]:
+            out.append(f"  ! record {row_number}: {message}")
+        for sku in self.failed[:limit]:
+            out.append(f"  x {sku}")
+        for sku in self.missing[:limit]:
+            out.append(f"  ? {sku}")
+        return out
+
+
+def _normalise_header(name):
+    return str(name or "").strip().lower().replace(" ", "_")
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield {_normalise_header(k): v for k, v in row.items() if k is not None}
+
+
+def _read_json(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield {_normalise_header(k): v for k, v in json.loads(line).items()}
+        return
+    if ijson is not None:
+        with open(path, "rb") as f:
+            first = f.read(1)
+            while first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            # Either a bare array or {"products": [...]}
+            prefix = "products.item" if first == b"{" else "item"
+            for row in ijson.items(f, prefix, use_float=True):
+                yield {_normalise_header(k): v for k, v in row.items()}
+        return
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("products", [])
+    for row in data:
+        yield {_normalise_header(k): v for k, v in row.items()}
+
+
+def _read_xlsx(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_normalise_header(h) for h in next(rows, [])]
+        for values in rows:
+            if any(v is not None for v in values):
+                yield {h: v for h, v in zip(header, values) if h}
+    finally:
+        workbook.close()
+
+
+READERS = {".csv": _read_csv, ".json": _read_json, ".jsonl": _read_json, ".ndjson": _read_json,
+           ".xlsx": _read_xlsx}
+
+
+def read_rows(path):
+    """Yield one dict per product row in `path`, with normalised column names."""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {path} (expected one of {', '.join(sorted(READERS))})")
+    return reader(path)
+
+
+def validate_row(row):
+    """Return the cleaned row (known columns with a value in the file) or raise ValueError."""
+    clean = {}
+    for column, (kind, required, max_length) in IMPORT_COLUMNS.items():
+        if column not in row:
+            if required:
+                raise ValueError(f"missing {column}")
+            continue
+        value = row[column]
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            if required:
+                raise ValueError(f"missing {column}")
+            # Not a request to clear the column (stock would become NULL)
+            continue
+        try:
+            if kind is int:
+                value = int(float(value))
+            elif kind is float:
+                value = float(value)
+            else:
+                value = str(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{column} must be a number, got {value!r}")
+        if kind in (int, float) and value < 0:
+            raise ValueError(f"{column} must not be negative")
+        if max_length and len(value) > max_length:
+            raise ValueError(f"{column} is longer than {max_length} characters")
+        clean[column] = value
+    return clean
+
+
+def _upsert(rows):
+    """Insert or update `rows` (dicts with the same keys) in one statement."""
+    now = datetime.utcnow()
+    rows = [dict(row, updated_at=now) for row in rows]
+    columns = set(rows[0]) - {"sku"}
+    stmt = upsert_insert(Product).values([dict(row, created_at=now) for row in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.sku],
+        set_={column: stmt.excluded[column] for column in columns},
+    )
+    db.session.execute(stmt)
+
+
+def _flush_batch(batch, report, dry_run):
+    """Diff `batch` against the database and write what changed.
+
+    Adds to `report` only once the batch is committed, so a failed attempt
+    can be retried without counting its rows twice.
+    """
+    if not dry_run:
+        # Write lock up front: reading the batch and then upserting it in a
+        # deferred transaction fails outright if a checkout commits in between
+        begin_immediate(db.session)
+    existing = {
+        product.sku: product
+        for product in db.session.execute(
+            select(Product).where(Product.sku.in_([row["sku"] for row in batch]))
+        ).scalars()
+    }
+    to_write = []
+    created, updated, unchanged = [], [], 0
+    for row in batch:
+        product = existing.get(row["sku"])
+        if product is None:
+            created.append(row["sku"])
+            to_write.append(row)
+            continue
+        changes = {
+            column: (getattr(product, column), value)
+            for column, value in row.items()
+            if column != "sku" and getattr(product, column) != value
+        }
+        if changes:
+            updated.append((row["sku"], changes))
+            to_write.append(row)
+        else:
+            unchanged += 1
+    db.session.expunge_all()
+
+    if not dry_run and to_write:
+        _write_batch(to_write)
+    else:
+        db.session.rollback()
+    report.created += created
+    report.updated += updated
+    report.unchanged += unchanged
+
+
+def _write_batch(to_write):
+    # One statement per distinct column set (files can leave cells out per row)
+    by_columns = {}
+    for row in to_write:
+        by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in by_columns.values():
+        _upsert(rows)
+    # Core inserts bypass the ORM listeners that normally flag this
+    mark_catalog_dirty(db.session)
+    stock_skus = [row["sku"] for row in to_write if "stock" in row]
+    if stock_skus:
+        publish_stock_changes(db.session.execute(
+            select(Product.id).where(Product.sku.in_(stock_skus))
+        ).scalars().all())
+    db.session.commit()
+
+
+def _flush_with_retries(batch, report, dry_run, retries=IMPORT_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            _flush_batch(batch, report, dry_run)
+            return
+        except OperationalError as e:
+            db.session.rollback()
+            logger.warning("Import batch of %d rows failed (attempt %d): %s", len(batch), attempt + 1, e)
+            if attempt < retries:
+                time.sleep(2 ** attempt)
+    report.failed += [row["sku"] for row in batch]
+
+
+def import_products(path, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """Upsert every valid row of `path` and return an ImportReport."""
+    report = ImportReport()
+    seen = set()
+    batch = []
+    for row_number, raw in enumerate(read_rows(path), start=1):
+        try:
+            row = validate_row(raw)
+        except ValueError as e:
+            report.errors.append((row_number, str(e)))
+            continue
+        if row["sku"] in seen:
+            report.errors.append((row_number, f"duplicate sku {row['sku']!r}"))
+            continue
+        seen.add(row["sku"])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush_with_retries(batch, report, dry_run)
+            batch = []
+    if batch:
+        _flush_with_retries(batch, report, dry_run)
+
+    report.missing = sorted(
+        sku for sku in db.session.execute(select(Product.sku).where(Product.sku.isnot(None))).scalars()
+        if sku not in seen
+    )
+    return report
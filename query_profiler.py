@@ -0,0 +1,127 @@
+"""Per-request SQL profiling: query log, N+1 detection and slow-query log.
+
+Environment:
+
+  QUERY_PROFILING        "1" to capture every statement a request issues, with
+                         its duration and the line of app code that ran it;
+                         the log is written when the request ends and the
+                         response gets a Server-Timing header (db, serialize,
+                         total) for browser devtools. Off by default: walking
+                         the stack for every statement is not free.
+  N_PLUS_ONE_THRESHOLD   identical statements per request before they are
+                         reported as a likely N+1 (default 5)
+  SLOW_QUERY_MS          statements slower than this are logged with their
+                         origin even when profiling is off (default 500, 0 = off)
+"""
+import logging
+import os
+import sys
+import time
+import traceback
+from collections import Counter
+
+from flask import g, has_request_context
+from sqlalchemy import event
+
+from utils import env_bool
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILING = env_bool("QUERY_PROFILING", False)
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 500))
+
+APP_DIR = os.path.abspath(os.path.dirname(__file__))
+_LIBRARY_DIRS = tuple({os.path.abspath(p) for p in (sys.prefix, sys.base_prefix, sys.exec_prefix)})
+
+
+def _origin():
+    """'file:line in function' of the innermost app frame that issued the query."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith("<"):
+            continue
+        filename = os.path.abspath(frame.filename)
+        if (filename.startswith(APP_DIR) and filename != __file__
+                and not filename.startswith(_LIBRARY_DIRS)):
+            return f"{os.path.relpath(filename, APP_DIR)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+def _shorten(statement, limit=300):
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def init_query_profiler(app, db, profiling=QUERY_PROFILING, slow_query_ms=SLOW_QUERY_MS,
+                        n_plus_one_threshold=N_PLUS_ONE_THRESHOLD):
+    """Attach the slow-query log (and, if `profiling`, the per-request query log) to `app`."""
+    if not profiling and not slow_query_ms:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profiler_start"].pop()) * 1000
+        origin = None
+        if slow_query_ms and elapsed_ms >= slow_query_ms:
+            origin = _origin()
+            logger.warning("Slow query (%.1f ms) from %s: %s", elapsed_ms, origin, _shorten(statement))
+        if profiling and has_request_context() and "_query_log" in g:
+            g._query_log.append((statement, elapsed_ms, origin or _origin()))
+
+    if not profiling:
+        return
+
+    # Time spent turning responses into JSON, reported separately from the DB
+    provider = app.json
+    dumps = provider.dumps
+
+    def timed_dumps(obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and "_query_log" in g:
+                g._serialize_ms += (time.perf_counter() - started) * 1000
+
+    provider.dumps = timed_dumps
+
+    @app.before_request
+    def _start_query_log():
+        g._query_log = []
+        g._serialize_ms = 0.0
+        g._profile_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_query_log(response):
+        queries = g.pop("_query_log", None)
+        if queries is None:
+            return response
+        total_ms = (time.perf_counter() - g._profile_started) * 1000
+        db_ms = sum(elapsed for _, elapsed, _ in queries)
+
+        logger.info("%d queries, %.1f ms in the database, %.1f ms total",
+                    len(queries), db_ms, total_ms)
+        for statement, elapsed, origin in queries:
+            logger.debug("  %.2f ms  %s  %s", elapsed, origin, _shorten(statement))
+
+        repeats = Counter(statement for statement, _, _ in queries)
+        for statement, count in repeats.items():
+            if count >= n_plus_one_threshold:
+                origins = sorted({origin for s, _, origin in queries if s == statement})
+                logger.warning("Possible N+1: statement ran %d times from %s: %s",
+                               count, ", ".join(origins), _shorten(statement))
+
+        response.headers["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{len(queries)} queries", '
+            f"serialize;dur={g._serialize_ms:.1f}, total;dur={total_ms:.1f}"
+        )
+        # Lets the frontend (a different origin) read the timings in devtools
+        response.headers["Timing-Allow-Origin"] = "*"
+        return response
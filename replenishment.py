@@ -0,0 +1,186 @@
+"""Replenishment: sales velocity, days of cover and reorder suggestions.
+
+Velocity is the units per day a product sold over the last
+REORDER_WINDOW_DAYS days (or over the store's history, if that is shorter).
+Days of cover is stock / velocity. A product needs reordering once its
+stock can't last the delivery lead time plus REORDER_SAFETY_DAYS. The
+suggested quantity then tops it up to REORDER_TARGET_COVER_DAYS of sales
+after delivery. Products at or below LOW_STOCK_THRESHOLD are flagged
+whatever their velocity.
+
+The engine keeps a products x days matrix of units sold in the window (a
+pandas DataFrame). The first request builds it from the window's orders.
+Later requests only fold in orders with an id above the last one seen, and
+days that fall out of the window are dropped. Cancellations and other status
+changes are picked up by a full rebuild every REORDER_REBUILD_INTERVAL
+seconds. Suggestions are computed for every product at once with numpy, and
+cached until a new order arrives, the catalog changes or
+REORDER_CACHE_TTL seconds pass (which bounds staleness from writes made by
+other workers).
+
+Environment:
+
+  REORDER_WINDOW_DAYS         days of sales behind the velocity (default 28)
+  REORDER_LEAD_TIME_DAYS      days between ordering stock and receiving it (default 3)
+  REORDER_SAFETY_DAYS         extra days of sales kept in hand (default 2)
+  REORDER_TARGET_COVER_DAYS   days of sales a reorder should cover (default 14)
+  LOW_STOCK_THRESHOLD         units at or below which a product is low (default 5)
+  REORDER_REBUILD_INTERVAL    seconds between full rebuilds (default 3600)
+  REORDER_CACHE_TTL           seconds suggestions are reused (default 30)
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, or_, select
+
+from analytics import EXCLUDED_STATUSES
+from catalog_cache import catalog_cache
+from models import db, Order, OrderItem, Product
+
+REORDER_WINDOW_DAYS = int(os.environ.get("REORDER_WINDOW_DAYS", 28))
+REORDER_LEAD_TIME_DAYS = float(os.environ.get("REORDER_LEAD_TIME_DAYS", 3))
+REORDER_SAFETY_DAYS = float(os.environ.get("REORDER_SAFETY_DAYS", 2))
+REORDER_TARGET_COVER_DAYS = float(os.environ.get("REORDER_TARGET_COVER_DAYS", 14))
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", 5))
+REORDER_REBUILD_INTERVAL = float(os.environ.get("REORDER_REBUILD_INTERVAL", 3600))
+REORDER_CACHE_TTL = float(os.environ.get("REORDER_CACHE_TTL", 30))
+
+SUGGESTION_COLUMNS = [
+    "product_id", "sku", "name", "stock", "sold", "velocity", "days_of_cover",
+    "reorder_point", "reorder_quantity", "low_stock", "needs_reorder",
+]
+
+
+def _daily_matrix(lines):
+    """Pivot (order_time, product_id, quantity) lines into products x days."""
+    if lines.empty:
+        return pd.DataFrame(index=pd.Index([], name="product_id"), columns=pd.DatetimeIndex([]), dtype="int64")
+    lines["day"] = pd.to_datetime(lines["order_time"]).dt.normalize()
+    return lines.pivot_table(index="product_id", columns="day", values="quantity",
+                             aggfunc="sum", fill_value=0)
+
+
+class ReplenishmentEngine:
+    """Incrementally maintained sales window plus cached reorder suggestions."""
+
+    def __init__(self, window_days=REORDER_WINDOW_DAYS, rebuild_interval=REORDER_REBUILD_INTERVAL,
+                 cache_ttl=REORDER_CACHE_TTL):
+        self.window_days = window_days
+        self.rebuild_interval = rebuild_interval
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._daily = None
+        self._last_order_id = 0
+        self._built_at = 0.0
+        self._cached = None
+
+    def _order_lines(self, since, after_id, up_to_id):
+        rows = db.session.execute(
+            select(Order.order_time, OrderItem.product_id, OrderItem.quantity)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(
+                Order.order_time >= since,
+                Order.id > after_id,
+                Order.id <= up_to_id,
+                OrderItem.product_id.isnot(None),
+                or_(Order.status.is_(None), Order.status.notin_(EXCLUDED_STATUSES)),
+            )
+        ).all()
+        return pd.DataFrame([tuple(row) for row in rows], columns=["order_time", "product_id", "quantity"])
+
+    def _refresh(self, today):
+        """Bring the sales window up to date; True if it changed."""
+        start = today - pd.Timedelta(days=self.window_days - 1)
+        # Capped at the id read up front, so an order committed mid-read is
+        # neither missed nor counted twice
+        latest = db.session.execute(select(func.max(Order.id))).scalar() or 0
+        changed = False
+        if self._daily is None or time.monotonic() - self._built_at > self.rebuild_interval:
+            self._daily = _daily_matrix(self._order_lines(start.to_pydatetime(), 0, latest))
+            self._built_at = time.monotonic()
+            changed = True
+        elif latest > self._last_order_id:
+            new = _daily_matrix(self._order_lines(start.to_pydatetime(), self._last_order_id, latest))
+            if not new.empty:
+                self._daily = self._daily.add(new, fill_value=0)
+                changed = True
+        self._last_order_id = latest
+
+        expired = self._daily.columns < start
+        if expired.any():
+            self._daily = self._daily.loc[:, ~expired]
+            changed = True
+        return changed
+
+    def suggestions(self):
+        """DataFrame of SUGGESTION_COLUMNS for every product, most urgent first."""
+        with self._lock:
+            today = pd.Timestamp(datetime.utcnow().date())
+            changed = self._refresh(today)
+            key = (self._last_order_id, catalog_cache.version, today)
+            if (not changed and self._cached is not None and self._cached[0] == key
+                    and time.monotonic() - self._cached[1] <= self.cache_ttl):
+                return self._cached[2]
+            result = self._compute(today)
+            self._cached = (key, time.monotonic(), result)
+            return result
+
+    def _compute(self, today):
+        products = pd.DataFrame(
+            [tuple(row) for row in db.session.execute(
+                select(Product.id, Product.sku, Product.name, Product.stock).order_by(Product.id)
+            )],
+            columns=["product_id", "sku", "name", "stock"],
+        )
+        daily = self._daily
+        sold = daily.sum(axis=1).reindex(products["product_id"], fill_value=0).to_numpy(dtype=float)
+        # A store with less history than the window divides by the days it
+        # has been taking orders (not by a product's own first sale, which
+        # would inflate the velocity of anything that sold only today)
+        days = self.window_days
+        first_order = db.session.execute(select(func.min(Order.order_time))).scalar()
+        if first_order is not None:
+            days = max(1, min(days, (today - pd.Timestamp(first_order).normalize()).days + 1))
+
+        stock = products["stock"].fillna(0).clip(lower=0).to_numpy(dtype=float)
+        velocity = sold / days
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cover = np.where(velocity > 0, stock / velocity, np.inf)
+        reorder_point = velocity * (REORDER_LEAD_TIME_DAYS + REORDER_SAFETY_DAYS)
+        target = velocity * (REORDER_LEAD_TIME_DAYS + REORDER_TARGET_COVER_DAYS)
+        low_stock = stock <= LOW_STOCK_THRESHOLD
+
+        products["sold"] = sold.astype(int)
+        products["velocity"] = velocity.round(2)
+        products["days_of_cover"] = np.where(np.isinf(cover), np.nan, cover.round(1))
+        products["reorder_point"] = np.ceil(reorder_point).astype(int)
+        products["reorder_quantity"] = np.ceil(np.maximum(target - stock, 0)).astype(int)
+        products["low_stock"] = low_stock
+        products["needs_reorder"] = ((velocity > 0) & (stock <= reorder_point)) | low_stock
+        products["stock"] = products["stock"].fillna(0).astype(int)
+
+        products = products.assign(_cover=cover).sort_values(["_cover", "stock", "product_id"])
+        return products[SUGGESTION_COLUMNS].reset_index(drop=True)
+
+
+replenishment = ReplenishmentEngine()
+
+
+def reorder_suggestions(include_all=False):
+    """Reorder suggestions as a JSON-ready dict (only products needing stock unless `include_all`)."""
+    df = replenishment.suggestions()
+    if not include_all:
+        df = df[df["needs_reorder"]]
+    df = df.astype(object).where(df.notna(), None)
+    return {
+        "window_days": replenishment.window_days,
+        "lead_time_days": REORDER_LEAD_TIME_DAYS,
+        "safety_days": REORDER_SAFETY_DAYS,
+        "target_cover_days": REORDER_TARGET_COVER_DAYS,
+        "low_stock_threshold": LOW_STOCK_THRESHOLD,
+        "suggestions": df.to_dict("records"),
+    }
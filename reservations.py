@@ -0,0 +1,249 @@
+"""Stock reservations: hold units for a kiosk cart until checkout or expiry.
+
+Adding an item to a cart reserves it, so two kiosks can't both fill a cart
+with the last units and have one of them fail at payment time. A hold lasts
+RESERVATION_TTL seconds past the cart's last change. Checkout releases the
+cart's holds and takes the units out of stock in the same transaction.
+Abandoned carts are cleaned up by a background sweeper in each worker, which
+deletes expired holds in batches of RESERVATION_SWEEP_BATCH.
+
+Holds are rows in stock_hold, so every gunicorn worker sees the same ones.
+The per-product index is Product.reserved, the sum of that product's holds.
+It is updated in the same transaction as every hold change. Available stock
+is `stock - reserved`, read off a single row: the check costs the same with
+ten open carts or ten thousand.
+
+Environment:
+
+  RESERVATION_TTL             seconds a hold outlives the cart's last change (default 900)
+  RESERVATION_SWEEP_INTERVAL  seconds between sweeps (default 5)
+  RESERVATION_SWEEP_BATCH     holds expired per statement (default 500)
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, select, update
+
+from events import publish
+from models import db, Product, StockHold
+from utils import start_per_process_thread
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = int(os.environ.get("RESERVATION_TTL", 900))
+RESERVATION_SWEEP_INTERVAL = float(os.environ.get("RESERVATION_SWEEP_INTERVAL", 5))
+RESERVATION_SWEEP_BATCH = int(os.environ.get("RESERVATION_SWEEP_BATCH", 500))
+
+
+class InsufficientStock(Exception):
+    """Raised by reserve() when the product can't cover the requested quantity."""
+
+    def __init__(self, product_id, available):
+        super().__init__(f"Only {available} of product {product_id} available")
+        self.product_id = product_id
+        self.available = available
+
+
+def available_stock(stock, reserved):
+    return max(0, (stock or 0) - (reserved or 0))
+
+
+def _change_reserved(deltas):
+    """Add `deltas` ({product_id: delta}) onto Product.reserved.
+
+    Core statement on the session's connection: the catalog cache doesn't
+    include `reserved`, so this must not invalidate it, and updated_at is
+    pinned so Last-Modified only moves when the catalog itself changes.
+    Rows are updated in id order so concurrent transactions lock them in the
+    same order.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = Product.__table__
+    db.session.connection().execute(
+        table.update()
+        .where(table.c.id == bindparam("product_id"))
+        .values(reserved=table.c.reserved + bindparam("delta"), updated_at=table.c.updated_at),
+        [{"product_id": product_id, "delta": deltas[product_id]} for product_id in sorted(deltas)]
+    )
+
+
+def _released(rows):
+    """Sum (product_id, quantity) rows into {product_id: -quantity}."""
+    deltas = {}
+    for product_id, quantity in rows:
+        deltas[product_id] = deltas.get(product_id, 0) - quantity
+    return deltas
+
+
+def publish_stock_changes(product_ids):
+    """Publish a stock-changed event with the current stock of `product_ids`."""
+    if not product_ids:
+        return
+    rows = db.session.execute(
+        select(Product.id, Product.stock, Product.reserved)
+        .where(Product.id.in_(list(product_ids)))
+        .order_by(Product.id)
+    ).all()
+    if rows:
+        publish("stock-changed", {"products": [
+            {"id": product_id, "stock": stock, "available": available_stock(stock, reserved)}
+            for product_id, stock, reserved in rows
+        ]})
+
+
+def reserve(cart_id, product_id, quantity, ttl=RESERVATION_TTL):
+    """Set the cart's hold on `product_id` to `quantity` units (0 releases it).
+
+    Runs inside the current transaction and returns the hold as a dict.
+    Raises InsufficientStock if the other carts' holds leave too little, and
+    LookupError if the product doesn't exist. Any change renews the expiry of
+    every hold in the cart.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl)
+    hold = db.session.execute(
+        select(StockHold.id, StockHold.quantity)
+        .where(StockHold.cart_id == cart_id, StockHold.product_id == product_id)
+        .with_for_update()
+    ).first()
+    held = hold.quantity if hold else 0
+    delta = quantity - held
+
+    table = Product.__table__
+    if delta > 0:
+        # Guarded increment: checks and reserves atomically under the row lock
+        result = db.session.connection().execute(
+            table.update()
+            .where(table.c.id == product_id, table.c.stock - table.c.reserved >= delta)
+            .values(reserved=table.c.reserved + delta, updated_at=table.c.updated_at)
+        )
+        if result.rowcount == 0:
+            row = db.session.execute(
+                select(Product.stock, Product.reserved).where(Product.id == product_id)
+            ).first()
+            if row is None:
+                raise LookupError(f"Product {product_id} not found")
+            raise InsufficientStock(product_id, available_stock(row.stock, row.reserved) + held)
+    elif delta < 0:
+        _change_reserved({product_id: delta})
+
+    if quantity == 0:
+        if hold:
+            db.session.execute(delete(StockHold).where(StockHold.id == hold.id))
+    elif hold:
+        db.session.execute(update(StockHold).where(StockHold.id == hold.id).values(quantity=quantity))
+    else:
+        db.session.add(StockHold(cart_id=cart_id, product_id=product_id, quantity=quantity,
+                                 created_at=now, expires_at=expires_at))
+        db.session.flush()
+    db.session.execute(update(StockHold).where(StockHold.cart_id == cart_id).values(expires_at=expires_at))
+    if delta:
+        publish_stock_changes([product_id])
+
+    return {"product_id": product_id, "quantity": quantity, "expires_at": expires_at if quantity else None}
+
+
+def release_cart(cart_id, publish_changes=True):
+    """Drop every hold of `cart_id`, returning {product_id: quantity} released.
+
+    Checkout calls this before taking stock, inside the same transaction, so
+    the cart's own holds count as available to it (and publishes the
+    combined stock change itself).
+    """
+    rows = db.session.execute(
+        delete(StockHold)
+        .where(StockHold.cart_id == cart_id)
+        .returning(StockHold.product_id, StockHold.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    _change_reserved(_released(rows))
+    if publish_changes:
+        publish_stock_changes({product_id for product_id, _ in rows})
+    return {product_id: quantity for product_id, quantity in rows}
+
+
+def cart_holds(cart_id):
+    """Unexpired holds of `cart_id` as dicts."""
+    rows = db.session.execute(
+        select(StockHold.product_id, StockHold.quantity, StockHold.expires_at)
+        .where(StockHold.cart_id == cart_id, StockHold.expires_at > datetime.utcnow())
+        .order_by(StockHold.product_id)
+    ).all()
+    return [{"product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+            for product_id, quantity, expires_at in rows]
+
+
+def availability(product_ids=None):
+    """[{id, stock, reserved, available}] for `product_ids` (default: every product)."""
+    query = select(Product.id, Product.stock, Product.reserved).order_by(Product.id)
+    if product_ids is not None:
+        query = query.where(Product.id.in_(product_ids))
+    return [
+        {"id": product_id, "stock": stock, "reserved": reserved, "available": available_stock(stock, reserved)}
+        for product_id, stock, reserved in db.session.execute(query)
+    ]
+
+
+def expire_holds(now=None, batch_size=RESERVATION_SWEEP_BATCH):
+    """Delete expired holds, one committed batch at a time; returns how many.
+
+    DELETE ... RETURNING hands each hold to exactly one sweeper, so workers
+    sweeping at the same moment never release the same units twice.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        batch = (select(StockHold.id).where(StockHold.expires_at <= now)
+                 .order_by(StockHold.expires_at).limit(batch_size))
+        rows = db.session.execute(
+            delete(StockHold)
+            .where(StockHold.id.in_(batch.scalar_subquery()))
+            .returning(StockHold.product_id, StockHold.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        _change_reserved(_released(rows))
+        publish_stock_changes({product_id for product_id, _ in rows})
+        db.session.commit()
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
+
+
+class HoldSweeper:
+    """Background thread that runs expire_holds() every `interval` seconds."""
+
+    def __init__(self, app, interval=RESERVATION_SWEEP_INTERVAL):
+        self.app = app
+        self.interval = interval
+
+    def start(self):
+        start_per_process_thread("hold-sweeper", self._run)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.app.app_context():
+                try:
+                    expired = expire_holds()
+                    if expired:
+                        logger.info("Expired %d stock holds", expired)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error("Stock hold sweep failed: %s", e)
+                finally:
+                    db.session.remove()
+
+
+def init_reservations(app):
+    """Start the hold sweeper in each worker, on its first request."""
+    sweeper = HoldSweeper(app)
+
+    @app.before_request
+    def _start_hold_sweeper():
+        sweeper.start()
+
+    return sweeper
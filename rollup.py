@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_
+
+from analytics import EXCLUDED_STATUSES
+from models import db, upsert_insert, DailySales, Order, OrderItem, Product, RollupState
+
+ROLLUP_NAME = "daily_sales"
+
+
+def _counts_as_sale(status):
+    return status not in EXCLUDED_STATUSES
+
+
+def _upsert(rows):
+    """Add `rows` onto existing daily_sales rows with a single upsert."""
+    stmt = upsert_insert(DailySales).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySales.sale_date, DailySales.product_id, DailySales.category],
+        set_={
+            "product_name": stmt.excluded.product_name,
+            "quantity": DailySales.quantity + stmt.excluded.quantity,
+            "revenue": DailySales.revenue + stmt.excluded.revenue,
+            "orders": DailySales.orders + stmt.excluded.orders,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def record_order_sales(order):
+    """Fold a newly created order into daily_sales.
+
+    Runs in the caller's transaction, so the rollup commits together with the
+    order. The order must already be flushed.
+    """
+    if not order.order_items or not _counts_as_sale(order.status):
+        return
+
+    product_ids = {item.product_id for item in order.order_items if item.product_id}
+    categories = dict(db.session.execute(
+        db.select(Product.id, func.lower(Product.category)).where(Product.id.in_(product_ids))
+    ).all()) if product_ids else {}
+
+    sale_date = (order.order_time or datetime.utcnow()).date()
+    lines = {}
+    for item in order.order_items:
+        product_id = item.product_id or 0
+        key = (product_id, categories.get(product_id, "unknown"))
+        line = lines.setdefault(key, {
+            "sale_date": sale_date,
+            "product_id": product_id,
+            "category": key[1],
+            "product_name": item.name,
+            "quantity": 0,
+            "revenue": 0.0,
+            "orders": 1,
+        })
+        line["quantity"] += item.quantity
+        line["revenue"] += item.quantity * item.unit_price
+    _upsert(list(lines.values()))
+
+
+def rebuild_days(start_day=None, end_day=None):
+    """Recompute daily_sales for [start_day, end_day) from order_item rows.
+
+    With no bounds the whole table is rebuilt. Runs in the caller's transaction.
+    """
+    delete = db.delete(DailySales)
+    if start_day:
+        delete = delete.where(DailySales.sale_date >= start_day)
+    if end_day:
+        delete = delete.where(DailySales.sale_date < end_day)
+    db.session.execute(delete)
+
+    sale_date = func.date(Order.order_time)
+    product_id = func.coalesce(OrderItem.product_id, 0)
+    category = func.coalesce(func.lower(Product.category), "unknown")
+    select = (
+        db.select(
+            sale_date,
+            product_id,
+            category,
+            func.max(OrderItem.name),
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.unit_price),
+            func.count(func.distinct(Order.id)),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(or_(Order.status.is_(None), Order.status.notin_(EXCLUDED_STATUSES)))
+        .group_by(sale_date, product_id, category)
+    )
+    if start_day:
+        select = select.where(Order.order_time >= datetime.combine(start_day, datetime.min.time()))
+    if end_day:
+        select = select.where(Order.order_time < datetime.combine(end_day, datetime.min.time()))
+
+    db.session.execute(db.insert(DailySales).from_select(
+        ["sale_date", "product_id", "category", "product_name", "quantity", "revenue", "orders"],
+        select
+    ))
+
+
+def refresh_daily_sales(full=False):
+    """Bring daily_sales up to date from the order_time watermark.
+
+    Every day from the watermark's day onwards is recomputed, so orders that
+    landed after the last refresh (or were written without going through
+    record_order_sales) are picked up. Returns the new watermark.
+    """
+    state = db.session.get(RollupState, ROLLUP_NAME)
+    if state is None:
+        state = RollupState(name=ROLLUP_NAME)
+        db.session.add(state)
+
+    start_day = None if full or state.watermark is None else state.watermark.date()
+    new_watermark = db.session.execute(db.select(func.max(Order.order_time))).scalar()
+
+    rebuild_days(start_day)
+    state.watermark = new_watermark
+    db.session.commit()
+    return new_watermark
+
+
+def order_status_changed(order, old_status):
+    """Recompute the order's day when a status change moves it in or out of sales."""
+    if _counts_as_sale(old_status) == _counts_as_sale(order.status) or not order.order_time:
+        return
+    day = order.order_time.date()
+    rebuild_days(day, day + timedelta(days=1))
+
+
+def order_deleted(order):
+    """Recompute the day of an order deleted (and flushed) in this transaction."""
+    if not _counts_as_sale(order.status) or not order.order_time:
+        return
+    day = order.order_time.date()
+    rebuild_days(day, day + timedelta(days=1))
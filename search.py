@@ -0,0 +1,169 @@
+"""Product search over name and description.
+
+Uses the full-text index created by migration dc07533580ee when it exists:
+an FTS5 table on SQLite, a weighted tsvector column with a GIN index on
+Postgres. Databases without it (e.g. created with db.create_all()) fall
+back to an in-memory inverted index that is rebuilt whenever the catalog
+cache is invalidated, i.e. after any write to the product table.
+
+Every query term is matched as a prefix, so "bas ri" finds "Basmati Rice"
+while the user is still typing. Name matches rank above description matches.
+
+SEARCH_BACKEND forces "fts" or "memory" instead of picking automatically.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import inspect, select, text
+
+from catalog_cache import CATALOG_CACHE_TTL, catalog_cache
+from models import db, Product
+
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto").lower()
+# Relative weight of a name match over a description match
+NAME_WEIGHT = 10.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(value):
+    return _TOKEN_RE.findall(value.lower()) if value else []
+
+
+class ProductSearchIndex:
+    """Inverted index of product name/description tokens, with prefix lookups."""
+
+    def __init__(self, rows):
+        postings = defaultdict(dict)
+        self.names = {}
+        self.categories = {}
+        for product_id, name, description, category in rows:
+            self.names[product_id] = name
+            self.categories[product_id] = (category or "").lower()
+            for token in tokenize(description):
+                postings[token].setdefault(product_id, 1.0)
+            for token in tokenize(name):
+                postings[token][product_id] = NAME_WEIGHT
+        self._postings = dict(postings)
+        self._tokens = sorted(self._postings)
+
+    def _prefix_matches(self, term):
+        scores = {}
+        start = bisect.bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            # Whole-word hits beat prefix hits of the same field
+            bonus = 1.0 if token == term else 0.0
+            for product_id, weight in self._postings[token].items():
+                scores[product_id] = max(scores.get(product_id, 0), weight + bonus)
+        return scores
+
+    def search(self, terms, limit, category=None):
+        scores = None
+        for term in terms:
+            matches = self._prefix_matches(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: score + matches[pid] for pid, score in scores.items() if pid in matches}
+            if not scores:
+                return []
+        if category:
+            scores = {pid: score for pid, score in scores.items() if self.categories[pid] == category}
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], self.names[pid]))
+        return ranked[:limit]
+
+
+class _MemoryIndexHolder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0.0
+
+    def _fresh(self, version):
+        # The TTL catches writes made by other workers, like the catalog cache
+        return (self._index is not None and self._version == version
+                and time.monotonic() - self._built_at <= CATALOG_CACHE_TTL)
+
+    def get(self):
+        """The current index, rebuilt if the catalog changed since it was built."""
+        version = catalog_cache.version
+        if self._fresh(version):
+            return self._index
+        with self._lock:
+            if not self._fresh(version):
+                rows = db.session.execute(
+                    select(Product.id, Product.name, Product.description, Product.category)
+                ).all()
+                self._index = ProductSearchIndex(rows)
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._index
+
+
+memory_index = _MemoryIndexHolder()
+
+# engine url -> bool, so the schema is inspected once per process
+_fts_available = {}
+
+
+def _has_fts(engine):
+    key = str(engine.url)
+    if key not in _fts_available:
+        if engine.dialect.name == "sqlite":
+            _fts_available[key] = inspect(engine).has_table("product_fts")
+        elif engine.dialect.name == "postgresql":
+            columns = inspect(engine).get_columns("product")
+            _fts_available[key] = any(column["name"] == "search_vector" for column in columns)
+        else:
+            _fts_available[key] = False
+    return _fts_available[key]
+
+
+def _fts_search(engine, terms, limit, category):
+    params = {"limit": limit}
+    category_filter = ""
+    if category:
+        category_filter = "AND lower(product.category) = :category"
+        params["category"] = category
+    if engine.dialect.name == "sqlite":
+        statement = text(
+            "SELECT product.id FROM product_fts JOIN product ON product.id = product_fts.rowid "
+            f"WHERE product_fts MATCH :match {category_filter} "
+            f"ORDER BY bm25(product_fts, {NAME_WEIGHT}, 1.0), product.name LIMIT :limit"
+        )
+        params["match"] = " ".join(f'"{term}"*' for term in terms)
+    else:
+        statement = text(
+            "SELECT product.id FROM product, to_tsquery('simple', :match) query "
+            f"WHERE product.search_vector @@ query {category_filter} "
+            "ORDER BY ts_rank(product.search_vector, query) DESC, product.name LIMIT :limit"
+        )
+        params["match"] = " & ".join(f"{term}:*" for term in terms)
+    return [row[0] for row in db.session.execute(statement, params)]
+
+
+def search_products(query, limit=20, category=None):
+    """Products matching every term of `query`, best match first."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+    category = category.lower() if category else None
+
+    engine = db.engine
+    use_fts = SEARCH_BACKEND == "fts" or (SEARCH_BACKEND == "auto" and _has_fts(engine))
+    if use_fts:
+        ids = _fts_search(engine, terms, limit, category)
+    else:
+        ids = memory_index.get().search(terms, limit, category)
+    if not ids:
+        return []
+
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(ids))}
+    return [products[pid] for pid in ids if pid in products]
@@ -0,0 +1,92 @@
+"""Model-to-dict serializers compiled from column metadata.
+
+A ModelSerializer generates one function per field list, equivalent to a
+hand-written `{"id": obj.id, "name": obj.name, ...}` literal, so serializing
+a row costs one call and plain attribute reads instead of a loop over
+fields. Datetimes are left as datetime objects; the JSON provider renders
+them (see json_provider.py).
+"""
+from sqlalchemy import inspect
+
+from models import Order, OrderItem, Product
+
+
+class ModelSerializer:
+    """Serializes instances of `model` to dicts.
+
+    fields:   output keys in order (default: every mapped column, in table order)
+    exclude:  columns to leave out of the default field list
+    rename:   {output key: attribute name} for keys that differ from the attribute
+    computed: {output key: function(obj)} for values that aren't a plain attribute;
+              a computed key named like a column takes that column's place
+    """
+
+    def __init__(self, model, fields=None, exclude=(), rename=None, computed=None):
+        self.model = model
+        self.rename = dict(rename or {})
+        self.computed = dict(computed or {})
+        if fields is None:
+            columns = [attr.key for attr in inspect(model).column_attrs]
+            fields = [key for key in columns if key not in exclude]
+            fields += [key for key in self.computed if key not in fields]
+        self.fields = tuple(fields)
+        self._compiled = {}
+        self._serialize = self._compile(self.fields)
+
+    def _compile(self, fields):
+        namespace = {}
+        entries = []
+        for i, key in enumerate(fields):
+            if key in self.computed:
+                namespace[f"_computed_{i}"] = self.computed[key]
+                entries.append(f"{key!r}: _computed_{i}(obj)")
+            else:
+                attr = self.rename.get(key, key)
+                if not attr.isidentifier():
+                    raise ValueError(f"{self.model.__name__} has no attribute {attr!r}")
+                entries.append(f"{key!r}: obj.{attr}")
+        source = f"def serialize(obj):\n    return {{{', '.join(entries)}}}\n"
+        exec(compile(source, f"<{self.model.__name__} serializer>", "exec"), namespace)
+        return namespace["serialize"]
+
+    def __call__(self, obj):
+        return self._serialize(obj)
+
+    def many(self, objs):
+        serialize = self._serialize
+        return [serialize(obj) for obj in objs]
+
+    def only(self, fields):
+        """A serializer for a subset of `fields`, compiled once per distinct list."""
+        fields = tuple(fields)
+        if fields == self.fields:
+            return self
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        subset = self._compiled.get(fields)
+        if subset is None:
+            subset = ModelSerializer(self.model, fields, rename=self.rename, computed=self.computed)
+            self._compiled[fields] = subset
+        return subset
+
+
+product_serializer = ModelSerializer(
+    Product,
+    # `reserved` changes with every cart and would go stale in the catalog cache;
+    # /api/products/availability reports it
+    exclude=("created_at", "updated_at", "reserved"),
+    computed={"category": lambda product: product.category.lower()},
+)
+
+order_item_serializer = ModelSerializer(
+    OrderItem,
+    fields=("id", "name", "price", "quantity"),
+    rename={"id": "product_id", "price": "unit_price"},
+)
+
+order_serializer = ModelSerializer(
+    Order,
+    # The raw JSON `items` column is replaced by the normalised line items
+    computed={"items": lambda order: order_item_serializer.many(order.order_items)},
+)
@@ -0,0 +1,165 @@
+import logging
+import os
+import queue
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
+
+from utils import env_bool, start_per_process_thread
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every new SQLite connection (SQLITE_TUNING=0 to skip)
+SQLITE_TUNING = env_bool("SQLITE_TUNING", True)
+SQLITE_PRAGMAS = {
+    # Readers no longer block the writer and vice versa
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    # Safe with WAL: a crash can lose the last commits but never corrupts the file
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Wait this many ms for a competing writer instead of failing with "database is locked"
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Negative values are KiB
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64000)),
+    "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Group-commit queue for order writes (SQLITE_WRITE_QUEUE=1 to enable)
+SQLITE_WRITE_QUEUE = env_bool("SQLITE_WRITE_QUEUE", False)
+SQLITE_WRITE_BATCH = int(os.environ.get("SQLITE_WRITE_BATCH", 50))
+SQLITE_WRITE_DELAY = float(os.environ.get("SQLITE_WRITE_DELAY_MS", 5)) / 1000
+SQLITE_WRITE_TIMEOUT = float(os.environ.get("SQLITE_WRITE_TIMEOUT", 30))
+
+
+def configure_sqlite(engine, tuning=SQLITE_TUNING, pragmas=SQLITE_PRAGMAS):
+    """Set up transaction handling (and optionally pragmas) for a SQLite engine.
+
+    pysqlite normally decides on its own when to emit BEGIN, which breaks
+    SAVEPOINTs; hand that job to SQLAlchemy instead, as its documentation
+    recommends. Foreign keys are enforced regardless of `tuning`: the models
+    rely on ON DELETE CASCADE / SET NULL, which SQLite ignores by default.
+    Transactions opened through begin_immediate() take the write lock at
+    BEGIN; all others are deferred.
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+        if tuning:
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql(f"BEGIN {conn.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+
+def begin_immediate(session):
+    """Open the session's next transaction with BEGIN IMMEDIATE on SQLite.
+
+    A deferred transaction that reads and then writes fails with
+    SQLITE_BUSY_SNAPSHOT, without waiting out busy_timeout, if another
+    connection committed in between; taking the write lock up front makes
+    it queue behind that writer instead. Call it before the transaction's
+    first statement; a transaction that is already open is left as it is.
+    Other databases ignore the option. Takes a Session, or a scoped_session
+    such as Flask-SQLAlchemy's db.session.
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    if not session.in_transaction():
+        session.connection(execution_options={"sqlite_begin": "IMMEDIATE"})
+
+
+class WriteQueue:
+    """Funnels writes through one thread that commits them in batches.
+
+    Concurrent requests hand their write function to submit(); the writer
+    thread runs up to `max_batch` of them, each in its own SAVEPOINT, and
+    commits them all in one transaction. On SQLite that turns N lock
+    acquisitions and commits into one. Write functions run with the app
+    context pushed and must return plain values (ids, flags), not ORM
+    objects, since the writer's session is closed after each batch.
+    """
+
+    def __init__(self, app, db, max_batch=SQLITE_WRITE_BATCH, max_delay=SQLITE_WRITE_DELAY,
+                 timeout=SQLITE_WRITE_TIMEOUT):
+        self.app = app
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._jobs = queue.Queue()
+
+    def submit(self, fn):
+        """Run `fn` in the next group commit and return its result."""
+        self._ensure_started()
+        future = Future()
+        self._jobs.put((fn, future))
+        return future.result(self.timeout)
+
+    def _ensure_started(self):
+        start_per_process_thread("sqlite-writer", self._run, before_start=self._reset)
+
+    def _reset(self):
+        # Jobs queued in the parent process have no thread left to run them
+        self._jobs = queue.Queue()
+
+    def _next_batch(self):
+        batch = [self._jobs.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._next_batch()
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    logger.error("Write queue batch failed: %s", e)
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    self.db.session.remove()
+
+    def _commit_batch(self, batch):
+        session = self.db.session
+        begin_immediate(session)
+        outcomes = []
+        for fn, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with session.begin_nested():
+                    outcomes.append((future, fn(), None))
+            except Exception as e:
+                outcomes.append((future, None, e))
+
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for future, _, error in outcomes:
+                future.set_exception(error or e)
+            return
+
+        logger.debug("Group commit of %d writes", len(outcomes))
+        for future, value, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
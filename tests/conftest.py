@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+# app.py reads its configuration at import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="kiosk-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from flask_migrate import stamp, upgrade  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models import db, Product  # noqa: E402
+
+MIGRATIONS_DIR = os.path.join(ROOT, "migrations")
+# database.db predates the migrations; it matches the initial revision
+BASE_REVISION = "15839c3dde7f"
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The app on a migrated copy of database.db."""
+    shutil.copy(os.path.join(ROOT, "database.db"), DB_PATH)
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        stamp(directory=MIGRATIONS_DIR, revision=BASE_REVISION)
+        upgrade(directory=MIGRATIONS_DIR)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_product(app):
+    """Create a product with a unique sku and return its id."""
+    def make(stock=10, price=2.5, category="Grains", name="Test product", description=None):
+        with app.app_context():
+            product = Product(sku=f"test-{uuid.uuid4().hex[:12]}", name=name, description=description,
+                              price=price, category=category, stock=stock)
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+    return make
+
+
+@pytest.fixture
+def stock_of(app):
+    def stock_of(product_id):
+        with app.app_context():
+            return db.session.get(Product, product_id).stock
+    return stock_of
+
+
+@pytest.fixture
+def checkout_body():
+    """Build a /api/checkout request body for `quantity` units of one product."""
+    def checkout_body(product_id, quantity=1, **extra):
+        return dict({
+            "cart": [{"id": product_id, "name": "Test product", "quantity": quantity, "price": 2.5}],
+            "total_price": 2.5 * quantity,
+            "paymentMethod": "card",
+            "customerName": "Test Customer",
+        }, **extra)
+    return checkout_body
+
+
+@pytest.fixture
+def admin_headers(client):
+    response = client.post("/api/admin/login", json={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json['token']}"}
@@ -0,0 +1,109 @@
+import threading
+import uuid
+
+import pytest
+
+from models import db, Order, OrderItem
+
+
+def test_checkout_places_order_and_takes_stock(app, client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+
+    response = client.post("/api/checkout", json=checkout_body(product_id, quantity=2))
+
+    assert response.status_code == 201
+    assert response.json["transaction_id"].startswith("TXN-")
+    assert stock_of(product_id) == 3
+    with app.app_context():
+        order = db.session.get(Order, response.json["order_id"])
+        assert order.transaction_id == response.json["transaction_id"]
+        assert order.payment_method == "card"
+        assert order.customer_name == "Test Customer"
+        assert [(item.product_id, item.quantity) for item in order.order_items] == [(product_id, 2)]
+
+
+def test_checkout_consumes_the_carts_holds(client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=3)
+    cart_id = uuid.uuid4().hex
+    assert client.put(f"/api/carts/{cart_id}/items/{product_id}", json={"quantity": 3}).status_code == 200
+    # The held units are not available to anyone else...
+    assert client.post("/api/checkout", json=checkout_body(product_id)).status_code == 400
+
+    # ...but are to the cart holding them
+    response = client.post("/api/checkout", json=checkout_body(product_id, quantity=3, cart_id=cart_id))
+
+    assert response.status_code == 201
+    assert stock_of(product_id) == 0
+    assert client.get(f"/api/carts/{cart_id}").json["holds"] == []
+
+
+def test_checkout_rejects_insufficient_stock(client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=1)
+
+    response = client.post("/api/checkout", json=checkout_body(product_id, quantity=2))
+
+    assert response.status_code == 400
+    assert stock_of(product_id) == 1
+
+
+def test_checkout_rejects_a_reused_transaction_id(client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+    body = checkout_body(product_id, transactionId=f"TXN-{uuid.uuid4().hex[:12]}")
+
+    assert client.post("/api/checkout", json=body).status_code == 201
+    assert client.post("/api/checkout", json=body).status_code == 409
+    assert stock_of(product_id) == 4
+
+
+def test_checkout_rejects_invalid_requests(client):
+    assert client.post("/api/checkout", json={"cart": []}).status_code == 400
+
+
+def test_concurrent_checkouts_never_oversell(app, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+    statuses = []
+
+    def buy():
+        statuses.append(app.test_client().post("/api/checkout", json=checkout_body(product_id)).status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 5 + [400] * 7
+    assert stock_of(product_id) == 0
+    with app.app_context():
+        sold = db.session.execute(
+            db.select(db.func.sum(OrderItem.quantity)).where(OrderItem.product_id == product_id)
+        ).scalar()
+    assert sold == 5
+
+
+
+
+@pytest.mark.parametrize("line", [
+    {"quantity": -40},
+    {"quantity": 0},
+    {"quantity": "2"},
+    {"quantity": True},
+    {"quantity": 1.5},
+    {"quantity": None},
+    {"id": None},
+    {"id": "not-a-product"},
+])
+def test_checkout_rejects_invalid_cart_lines(client, make_product, stock_of, line):
+    product_id = make_product(stock=50)
+    item = {"id": product_id, "name": "Test product", "price": 2.5, "quantity": 1}
+    item.update(line)
+    item = {key: value for key, value in item.items() if value is not None}
+
+    response = client.post("/api/checkout", json={"cart": [item], "total_price": 5})
+
+    assert response.status_code == 400
+    assert stock_of(product_id) == 50
+
+
+def test_checkout_rejects_an_empty_cart(client):
+    assert client.post("/api/checkout", json={"cart": [], "total_price": 0}).status_code == 400
@@ -0,0 +1,51 @@
+import gzip
+
+import pytest
+
+
+@pytest.fixture
+def product_url(make_product):
+    return f"/api/products/{make_product()}"
+
+
+def test_catalog_is_gzipped_when_accepted(client, make_product):
+    make_product()
+    plain = client.get("/api/products", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+
+
+def test_small_responses_are_sent_as_is(client, product_url):
+    response = client.get(product_url, headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "identity"])
+def test_304_matches_the_200_it_revalidates(client, make_product, encoding):
+    make_product()
+    first = client.get("/api/products", headers={"Accept-Encoding": encoding})
+    assert first.status_code == 200
+
+    second = client.get("/api/products", headers={"Accept-Encoding": encoding,
+                                                  "If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+    # Same validator and Vary as the 200 it stands for, compressed or not
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["ETag"].startswith('W/"')
+    assert second.headers["Vary"] == first.headers["Vary"] == "Accept-Encoding"
+
+
+def test_etag_matches_across_encodings(client, make_product):
+    make_product()
+    etag = client.get("/api/products", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    response = client.get("/api/products", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+
+    assert response.status_code == 304
@@ -0,0 +1,57 @@
+import pytest
+
+from models import db, Product
+
+
+@pytest.fixture
+def product_url(make_product):
+    return f"/api/products/{make_product()}"
+
+
+def test_catalog_revalidates_with_304(client, make_product):
+    make_product()
+    first = client.get("/api/products")
+    assert first.status_code == 200
+
+    second = client.get("/api/products", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_product_revalidates_with_304(client, product_url):
+    first = client.get(product_url)
+
+    assert client.get(product_url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.get(product_url, headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+
+def test_stale_etag_gets_the_new_body(app, client, make_product):
+    product_id = make_product(price=2.5)
+    etag = client.get(f"/api/products/{product_id}").headers["ETag"]
+    with app.app_context():
+        db.session.get(Product, product_id).price = 9.75
+        db.session.commit()
+
+    response = client.get(f"/api/products/{product_id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json["price"] == 9.75
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since_sees_a_deleted_product(app, client, make_product):
+    make_product()
+    doomed = make_product()
+    first = client.get("/api/products")
+    last_modified = first.headers["Last-Modified"]
+    assert client.get("/api/products", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, doomed))
+        db.session.commit()
+    response = client.get("/api/products", headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 200
+    assert doomed not in [product["id"] for product in response.json]
@@ -0,0 +1,64 @@
+import csv
+import gzip
+import io
+
+import pytest
+from openpyxl import load_workbook
+
+from app import EXPORT_COLUMNS
+
+
+@pytest.fixture
+def order(client, make_product, checkout_body):
+    product_id = make_product(stock=10)
+    response = client.post("/api/checkout", json=checkout_body(product_id, 3, notes="ring twice"))
+    return response.json
+
+
+def by_transaction(rows):
+    return {row[1]: row for row in rows}
+
+
+def test_csv_export(client, order):
+    response = client.get("/api/export-orders?format=csv", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == EXPORT_COLUMNS
+    row = by_transaction(rows[1:])[order["transaction_id"]]
+    assert (row[0], row[4], row[15]) == (str(order["order_id"]), "Test product (x3)", "ring twice")
+
+
+def test_csv_export_is_gzipped_as_it_streams(client, order):
+    plain = client.get("/api/export-orders?format=csv", headers={"Accept-Encoding": "identity"})
+    response = client.get("/api/export-orders?format=csv", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_xlsx_export(client, order):
+    response = client.get("/api/export-orders")
+
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.data), read_only=True).active
+    rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    assert rows[0] == EXPORT_COLUMNS
+    row = by_transaction(rows[1:])[order["transaction_id"]]
+    assert (row[0], row[4], row[5]) == (order["order_id"], "Test product (x3)", 7.5)
+
+
+def test_export_filters(client, order):
+    response = client.get("/api/export-orders?format=csv&status=delivered&date_from=2000-01-01")
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+    assert order["transaction_id"] not in by_transaction(rows[1:])
+    assert {row[14] for row in rows[1:]} <= {"delivered"}
+
+
+@pytest.mark.parametrize("query", ["format=pdf", "date_from=yesterday"])
+def test_export_rejects_bad_arguments(client, query):
+    assert client.get(f"/api/export-orders?{query}").status_code == 400
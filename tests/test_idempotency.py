@@ -0,0 +1,94 @@
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+
+import idempotency
+from idempotency import IDEMPOTENCY_LEASE
+from models import db, IdempotencyKey
+
+
+def test_replays_the_first_response(client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    body = checkout_body(product_id)
+
+    first = client.post("/api/checkout", json=body, headers=headers)
+    replay = client.post("/api/checkout", json=body, headers=headers)
+
+    assert first.status_code == replay.status_code == 201
+    assert replay.json == first.json
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert stock_of(product_id) == 4
+
+
+def test_key_reused_for_a_different_request(client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    assert client.post("/api/checkout", json=checkout_body(product_id), headers=headers).status_code == 201
+    response = client.post("/api/checkout", json=checkout_body(product_id, quantity=2), headers=headers)
+
+    assert response.status_code == 422
+    assert stock_of(product_id) == 4
+
+
+def test_abandoned_claim_is_reclaimed_after_the_lease(app, client, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=5)
+    key = uuid.uuid4().hex
+    body = checkout_body(product_id)
+    with app.app_context():
+        db.session.add(IdempotencyKey(key=key, endpoint="checkout", request_hash="abandoned",
+                                      created_at=datetime.utcnow()))
+        db.session.commit()
+
+    assert client.post("/api/checkout", json=body, headers={"Idempotency-Key": key}).status_code == 409
+
+    with app.app_context():
+        db.session.get(IdempotencyKey, key).created_at -= timedelta(seconds=IDEMPOTENCY_LEASE + 1)
+        db.session.commit()
+    assert client.post("/api/checkout", json=body, headers={"Idempotency-Key": key}).status_code == 201
+    assert stock_of(product_id) == 4
+
+
+def test_concurrent_keyed_checkouts(app, make_product, stock_of, checkout_body):
+    product_id = make_product(stock=1000)
+    statuses = Counter()
+
+    def buy():
+        client = app.test_client()
+        for _ in range(10):
+            response = client.post("/api/checkout", json=checkout_body(product_id),
+                                   headers={"Idempotency-Key": uuid.uuid4().hex})
+            statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=buy) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == {201: 120}
+    assert stock_of(product_id) == 880
+    with app.app_context():
+        assert IdempotencyKey.query.filter(IdempotencyKey.status_code.is_(None)).count() == 0
+
+
+def test_failed_store_releases_the_key(client, make_product, checkout_body, monkeypatch):
+    def locked(*args):
+        raise OperationalError("UPDATE idempotency_key", {}, Exception("database is locked"))
+
+    product_id = make_product(stock=5)
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    monkeypatch.setattr(idempotency, "_store", locked)
+    assert client.post("/api/checkout", json=checkout_body(product_id), headers=headers).status_code == 201
+    monkeypatch.undo()
+
+    # Not stuck behind a claim that never finishes
+    retry = client.post("/api/checkout", json=checkout_body(product_id), headers=headers)
+
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
@@ -0,0 +1,39 @@
+from sqlalchemy import text
+
+from models import db, Order, OrderItem
+
+
+def test_checkout_writes_one_row_per_cart_line(app, client, make_product):
+    rice, dal = make_product(price=50), make_product(price=120)
+    response = client.post("/api/checkout", json={
+        "cart": [{"id": rice, "name": "Rice", "quantity": 2, "price": 50},
+                 {"id": dal, "name": "Toor dal", "quantity": 1, "price": 120}],
+        "total_price": 220,
+    })
+    assert response.status_code == 201
+
+    with app.app_context():
+        items = OrderItem.query.filter_by(order_id=response.json["order_id"]).order_by(OrderItem.product_id).all()
+        assert [(i.product_id, i.name, i.quantity, i.unit_price) for i in items] == [
+            (rice, "Rice", 2, 50.0), (dal, "Toor dal", 1, 120.0)]
+
+
+def test_foreign_keys_are_enforced(app):
+    with app.app_context():
+        assert db.session.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_deleting_an_order_deletes_its_items(app, client, make_product, checkout_body):
+    product_id = make_product()
+    order_id = client.post("/api/checkout", json=checkout_body(product_id, 2)).json["order_id"]
+
+    assert client.delete(f"/api/orders/{order_id}").status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Order, order_id) is None
+        # ON DELETE CASCADE, which SQLite only honours with foreign_keys on
+        assert OrderItem.query.filter_by(order_id=order_id).count() == 0
+
+
+def test_delete_missing_order(client):
+    assert client.delete("/api/orders/999999999").status_code == 404
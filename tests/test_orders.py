@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def orders(client, make_product, checkout_body):
+    """Five orders sharing a payment method no other test uses; returns (method, ids)."""
+    method = f"test-{uuid.uuid4().hex[:8]}"
+    product_id = make_product(stock=100)
+    ids = [client.post("/api/checkout", json=checkout_body(product_id, paymentMethod=method)).json["order_id"]
+           for _ in range(5)]
+    return method, ids
+
+
+def all_pages(client, headers, **args):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(args, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/api/orders", query_string=query, headers=headers)
+        assert response.status_code == 200
+        ids += [order["id"] for order in response.json]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+def test_pages_cover_every_order_once(client, admin_headers, orders):
+    method, ids = orders
+
+    newest_first, pages = all_pages(client, admin_headers, payment_method=method, limit=2)
+    oldest_first, _ = all_pages(client, admin_headers, payment_method=method, limit=2, sort="asc")
+
+    assert pages == 3
+    assert newest_first == ids[::-1]
+    assert oldest_first == ids
+
+
+def test_fields_limit_the_columns_returned(client, admin_headers, orders):
+    method, ids = orders
+
+    response = client.get("/api/orders", query_string={"payment_method": method, "fields": "id,status"},
+                          headers=admin_headers)
+
+    assert [set(order) for order in response.json] == [{"id", "status"}] * 5
+
+
+@pytest.mark.parametrize("query", [{"cursor": "not-a-cursor"}, {"limit": "0"}, {"sort": "sideways"},
+                                   {"fields": "id,password"}, {"date_from": "yesterday"}])
+def test_invalid_query_arguments(client, admin_headers, query):
+    assert client.get("/api/orders", query_string=query, headers=admin_headers).status_code == 400
+
+
+def test_orders_need_a_token(client):
+    assert client.get("/api/orders").status_code == 401
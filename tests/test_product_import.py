@@ -0,0 +1,129 @@
+import json
+import threading
+import uuid
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import product_import
+from models import db, Product
+from product_import import import_products
+
+
+@pytest.fixture
+def sku():
+    return f"import-{uuid.uuid4().hex[:12]}"
+
+
+def write_csv(path, rows):
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def product(sku):
+    return Product.query.filter_by(sku=sku).one()
+
+
+def test_import_creates_then_updates_in_place(app, tmp_path, sku):
+    with app.app_context():
+        report = import_products(write_csv(tmp_path / "a.csv", [
+            "sku,name,price,stock,category", f"{sku},Basmati,50,20,Grains"]))
+        assert report.created == [sku]
+        product_id = product(sku).id
+
+        report = import_products(write_csv(tmp_path / "b.csv", ["sku,name,price", f"{sku},Basmati,55"]))
+        assert report.updated == [(sku, {"price": (50.0, 55.0)})]
+        imported = product(sku)
+        # Same row, and columns missing from the file are left alone
+        assert (imported.id, imported.price, imported.stock, imported.category) == (product_id, 55.0, 20, "Grains")
+
+        report = import_products(write_csv(tmp_path / "c.csv", ["sku,name,price", f"{sku},Basmati,55"]))
+        assert (report.created, report.updated, report.unchanged) == ([], [], 1)
+
+
+def test_blank_optional_cells_keep_the_current_value(app, tmp_path, sku):
+    with app.app_context():
+        import_products(write_csv(tmp_path / "a.csv", ["sku,name,price,stock", f"{sku},Oats,3,7"]))
+        report = import_products(write_csv(tmp_path / "b.csv", ["sku,name,price,stock,image", f"{sku},Oats,3,,"]))
+
+        assert report.unchanged == 1
+        assert product(sku).stock == 7
+
+
+def test_invalid_and_duplicate_rows_are_reported(app, tmp_path, sku):
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"products": [
+        {"sku": sku, "name": "Millet", "price": 4},
+        {"sku": sku, "name": "Millet again", "price": 4},
+        {"sku": f"{sku}-x", "name": "Bad", "price": -1},
+        {"name": "No sku", "price": 1},
+    ]}))
+    with app.app_context():
+        report = import_products(str(path))
+
+    assert report.created == [sku]
+    assert [row for row, _ in report.errors] == [2, 3, 4]
+
+
+def test_dry_run_writes_nothing(app, tmp_path, sku):
+    with app.app_context():
+        report = import_products(write_csv(tmp_path / "a.csv", ["sku,name,price", f"{sku},Ghee,9"]), dry_run=True)
+
+        assert report.created == [sku]
+        assert Product.query.filter_by(sku=sku).count() == 0
+
+
+def test_locked_batch_is_retried_without_double_counting(app, tmp_path, sku, monkeypatch):
+    write_batch = product_import._write_batch
+    calls = []
+
+    def locked_once(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OperationalError("INSERT INTO product", {}, Exception("database is locked"))
+        return write_batch(rows)
+
+    monkeypatch.setattr(product_import, "_write_batch", locked_once)
+    monkeypatch.setattr(product_import.time, "sleep", lambda seconds: None)
+    with app.app_context():
+        report = import_products(write_csv(tmp_path / "a.csv", ["sku,name,price", f"{sku},Corn,2"]))
+
+        assert calls == [1, 1]
+        assert (report.created, report.failed) == ([sku], [])
+        assert product(sku).price == 2.0
+
+
+def test_batch_that_stays_locked_is_reported_as_failed(app, tmp_path, sku, monkeypatch):
+    def locked(rows):
+        raise OperationalError("INSERT INTO product", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(product_import, "_write_batch", locked)
+    monkeypatch.setattr(product_import.time, "sleep", lambda seconds: None)
+    with app.app_context():
+        report = import_products(write_csv(tmp_path / "a.csv", ["sku,name,price", f"{sku},Corn,2"]))
+
+        assert (report.created, report.failed) == ([], [sku])
+        assert Product.query.filter_by(sku=sku).count() == 0
+
+
+def test_import_alongside_checkouts(app, tmp_path, make_product, checkout_body):
+    product_id = make_product(stock=1000)
+    rows = ["sku,name,price,stock"] + [f"bulk-{uuid.uuid4().hex[:8]}-{i},Item {i},1,5" for i in range(400)]
+    path = write_csv(tmp_path / "bulk.csv", rows)
+    statuses = []
+
+    def buy():
+        client = app.test_client()
+        for _ in range(10):
+            statuses.append(client.post("/api/checkout", json=checkout_body(product_id)).status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    with app.app_context():
+        report = import_products(path, batch_size=20)
+    for thread in threads:
+        thread.join()
+
+    assert (len(report.created), report.failed) == (400, [])
+    assert statuses == [201] * 60
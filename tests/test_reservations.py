@@ -0,0 +1,85 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Product, StockHold
+from reservations import RESERVATION_TTL, expire_holds
+
+
+@pytest.fixture
+def cart():
+    return uuid.uuid4().hex
+
+
+def available(client, product_id):
+    response = client.get("/api/products/availability", query_string={"ids": str(product_id)})
+    return response.json[0]["available"]
+
+
+def hold(client, cart_id, product_id, quantity):
+    return client.put(f"/api/carts/{cart_id}/items/{product_id}", json={"quantity": quantity})
+
+
+def test_holds_reduce_availability_until_released(client, make_product, cart):
+    product_id = make_product(stock=10)
+
+    assert hold(client, cart, product_id, 4).status_code == 200
+    assert available(client, product_id) == 6
+    # Setting a quantity replaces the hold rather than adding to it
+    assert hold(client, cart, product_id, 3).status_code == 200
+    assert available(client, product_id) == 7
+
+    assert client.delete(f"/api/carts/{cart}").json["released"] == 3
+    assert available(client, product_id) == 10
+
+
+def test_hold_beyond_availability_is_refused(client, make_product, cart):
+    product_id = make_product(stock=5)
+    assert hold(client, uuid.uuid4().hex, product_id, 4).status_code == 200
+
+    response = hold(client, cart, product_id, 2)
+
+    assert response.status_code == 409
+    assert response.json["available"] == 1
+
+
+@pytest.mark.parametrize("quantity", [-1, "2", True, None])
+def test_invalid_quantities(client, make_product, cart, quantity):
+    assert hold(client, cart, make_product(), quantity).status_code == 400
+
+
+def test_hold_on_a_missing_product(client, cart):
+    assert hold(client, cart, 999999999, 1).status_code == 404
+
+
+def test_expired_holds_are_swept(app, client, make_product, cart):
+    product_id = make_product(stock=10)
+    assert hold(client, cart, product_id, 6).status_code == 200
+
+    with app.app_context():
+        assert expire_holds(now=datetime.utcnow()) == 0
+        assert expire_holds(now=datetime.utcnow() + timedelta(seconds=RESERVATION_TTL + 1)) >= 1
+        assert StockHold.query.filter_by(cart_id=cart).count() == 0
+        product = db.session.get(Product, product_id)
+        assert (product.stock, product.reserved) == (10, 0)
+    assert client.get(f"/api/carts/{cart}").json["holds"] == []
+
+
+def test_concurrent_holds_never_overbook(app, make_product):
+    product_id = make_product(stock=5)
+    statuses = []
+
+    def reserve():
+        statuses.append(hold(app.test_client(), uuid.uuid4().hex, product_id, 1).status_code)
+
+    threads = [threading.Thread(target=reserve) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200] * 5 + [409] * 7
+    with app.app_context():
+        assert db.session.get(Product, product_id).reserved == 5
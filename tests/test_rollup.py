@@ -0,0 +1,58 @@
+from models import db, DailySales, Order
+from rollup import refresh_daily_sales
+
+
+def place_order(client, checkout_body, product_id, quantity):
+    response = client.post("/api/checkout", json=checkout_body(product_id, quantity))
+    assert response.status_code == 201
+    return response.json["order_id"]
+
+
+def sold_in_rollup(product_id):
+    return db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(DailySales.quantity), 0)).where(DailySales.product_id == product_id)
+    ).scalar()
+
+
+def test_checkout_is_folded_into_the_rollup(app, client, make_product, checkout_body):
+    product_id = make_product(stock=10, price=2.5)
+    place_order(client, checkout_body, product_id, 2)
+    place_order(client, checkout_body, product_id, 3)
+
+    with app.app_context():
+        row = DailySales.query.filter_by(product_id=product_id).one()
+        assert (row.quantity, row.revenue, row.orders, row.category) == (5, 12.5, 2, "grains")
+
+
+def test_status_changes_move_orders_in_and_out_of_sales(app, client, make_product, checkout_body,
+                                                        admin_headers):
+    product_id = make_product(stock=10)
+    order_id = place_order(client, checkout_body, product_id, 4)
+
+    def set_status(status):
+        response = client.put(f"/api/orders/{order_id}/status", json={"status": status}, headers=admin_headers)
+        assert response.status_code == 200
+
+    set_status("cancelled")
+    with app.app_context():
+        assert sold_in_rollup(product_id) == 0
+    set_status("delivered")
+    with app.app_context():
+        assert sold_in_rollup(product_id) == 4
+
+
+def test_delete_order_removes_its_sales(app, client, make_product, checkout_body):
+    product_id = make_product(stock=10)
+    kept = place_order(client, checkout_body, product_id, 1)
+    deleted = place_order(client, checkout_body, product_id, 3)
+    with app.app_context():
+        assert sold_in_rollup(product_id) == 4
+
+    assert client.delete(f"/api/orders/{deleted}").status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Order, kept) is not None
+        assert sold_in_rollup(product_id) == 1
+        # And the rollup agrees with a rebuild from scratch
+        refresh_daily_sales(full=True)
+        assert sold_in_rollup(product_id) == 1
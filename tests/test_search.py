@@ -0,0 +1,60 @@
+import uuid
+
+import pytest
+
+import search
+from models import db, Product
+
+
+@pytest.fixture(params=["fts", "memory"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_BACKEND", request.param)
+    return request.param
+
+
+@pytest.fixture
+def word():
+    """A token no other product contains, so results only hold this test's products."""
+    return "zq" + "".join(chr(ord("a") + int(c, 16) % 26) for c in uuid.uuid4().hex[:8])
+
+
+def found(client, q, **args):
+    response = client.get("/api/products/search", query_string=dict(args, q=q))
+    assert response.status_code == 200
+    return [product["id"] for product in response.json]
+
+
+def test_every_term_matches_as_a_prefix(client, make_product, backend, word):
+    rice = make_product(name=f"Basmati Rice {word}")
+    make_product(name=f"Brown Rice {word}")
+
+    assert found(client, f"bas ri {word[:4]}") == [rice]
+
+
+def test_name_matches_rank_above_description_matches(client, make_product, backend, word):
+    in_description = make_product(name="Aaa first by name", description=f"Goes well with {word}")
+    in_name = make_product(name=f"Zzz {word}")
+
+    assert found(client, word) == [in_name, in_description]
+
+
+def test_category_filter_and_limit(client, make_product, backend, word):
+    dairy = [make_product(name=f"{word} {i}", category="Dairy") for i in range(3)]
+    make_product(name=f"{word} grain", category="Grains")
+
+    assert sorted(found(client, word, category="dairy")) == sorted(dairy)
+    assert len(found(client, word, limit=2)) == 2
+
+
+def test_renamed_products_are_found_by_their_new_name(app, client, make_product, backend, word):
+    product_id = make_product(name="Plain name")
+    with app.app_context():
+        db.session.get(Product, product_id).name = f"Renamed {word}"
+        db.session.commit()
+
+    assert found(client, word) == [product_id]
+
+
+@pytest.mark.parametrize("query", [{}, {"q": "rice", "limit": "many"}, {"q": "rice", "limit": "0"}])
+def test_invalid_queries(client, query):
+    assert client.get("/api/products/search", query_string=query).status_code == 400
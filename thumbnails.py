@@ -0,0 +1,158 @@
+"""Width-constrained WebP/JPEG variants of product images, cached on disk.
+
+/api/images/<name>?w=320 redirects to a versioned URL
+(…?w=320&fmt=webp&v=<source version>). The version changes whenever the
+source file does, so the variant itself is served with
+`Cache-Control: immutable` and a one-year max-age. The format is WebP when
+the client's Accept header allows it and JPEG otherwise. Widths snap up to
+one of THUMBNAIL_WIDTHS so arbitrary sizes can't flood the cache.
+
+Variants live in THUMBNAIL_CACHE_DIR. Once the directory grows past
+THUMBNAIL_CACHE_MAX_MB, the least recently used files are evicted. Hits
+refresh a file's mtime, which serves as the LRU clock.
+
+Needs Pillow (`pip install Pillow`); without it the endpoint answers 501.
+
+Environment:
+
+  IMAGES_DIR               source images (default kiosk-frontend/public/images)
+  THUMBNAIL_CACHE_DIR      variant cache (default instance/thumbnails)
+  THUMBNAIL_CACHE_MAX_MB   cache size cap (default 256)
+  THUMBNAIL_WIDTHS         allowed widths (default 80,160,320,480,640)
+"""
+import hashlib
+import io
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: `pip install Pillow`
+    Image = None
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+IMAGES_DIR = os.environ.get("IMAGES_DIR", os.path.join(BASE_DIR, "kiosk-frontend", "public", "images"))
+THUMBNAIL_CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", os.path.join(BASE_DIR, "instance", "thumbnails"))
+THUMBNAIL_CACHE_MAX_BYTES = int(float(os.environ.get("THUMBNAIL_CACHE_MAX_MB", 256)) * 1024 * 1024)
+THUMBNAIL_WIDTHS = tuple(sorted(int(w) for w in os.environ.get("THUMBNAIL_WIDTHS", "80,160,320,480,640").split(",")))
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def available():
+    return Image is not None
+
+
+def snap_width(width):
+    """The smallest allowed width that is at least `width` (or the largest allowed)."""
+    for allowed in THUMBNAIL_WIDTHS:
+        if allowed >= width:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def source_version(path):
+    """Short token that changes whenever the source file is replaced or edited."""
+    stat = os.stat(path)
+    return hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:12]
+
+
+class ThumbnailCache:
+    """Directory of generated variants with an LRU size cap."""
+
+    def __init__(self, directory=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def path(self, name, width, fmt, version):
+        stem = os.path.splitext(name)[0]
+        return os.path.join(self.directory, f"{stem}-{width}w-{version}.{fmt}")
+
+    def get_or_create(self, source, name, width, fmt, version):
+        """Path of the variant, generating it on a miss."""
+        path = self.path(name, width, fmt, version)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+        data = render(source, width, fmt)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._added(len(data))
+        return path
+
+    def _added(self, nbytes):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+            else:
+                self._size += nbytes
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% of the cap so we don't evict again on the next miss
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        size = sum(entry.stat().st_size for entry in entries)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if size <= target:
+                break
+            try:
+                nbytes = entry.stat().st_size
+                os.remove(entry.path)
+                size -= nbytes
+            except OSError:
+                pass
+        self._size = size
+
+
+thumbnail_cache = ThumbnailCache()
+
+
+def render(source, width, fmt):
+    """Encode `source` scaled down to at most `width` pixels wide."""
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif fmt == "webp" and image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+        return buffer.getvalue()
+
+
+def generate_all(names, widths=THUMBNAIL_WIDTHS, formats=tuple(FORMATS), images_dir=IMAGES_DIR,
+                 cache=thumbnail_cache):
+    """Make sure every width/format variant of `names` is cached; returns (variants, missing sources)."""
+    variants, missing = 0, []
+    for name in names:
+        source = os.path.join(images_dir, name)
+        if not os.path.isfile(source):
+            missing.append(name)
+            continue
+        version = source_version(source)
+        for width in widths:
+            for fmt in formats:
+                cache.get_or_create(source, name, width, fmt, version)
+                variants += 1
+    return variants, missing
@@ -0,0 +1,31 @@
+import os
+import threading
+
+_thread_lock = threading.Lock()
+# (name, target) -> pid of the process whose thread is running
+_thread_pids = {}
+
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def start_per_process_thread(name, target, before_start=None):
+    """Run `target` in a daemon thread, once per process; True if this call started it.
+
+    Threads don't survive fork, so each gunicorn worker starts its own:
+    callers ask for the thread on every request or write, and only the first
+    call in a process starts it. `before_start` runs just before that, to
+    reset state inherited from the parent process.
+    """
+    key = (name, target)
+    if _thread_pids.get(key) == os.getpid():
+        return False
+    with _thread_lock:
+        if _thread_pids.get(key) == os.getpid():
+            return False
+        if before_start is not None:
+            before_start()
+        threading.Thread(target=target, name=name, daemon=True).start()
+        _thread_pids[key] = os.getpid()
+    return True